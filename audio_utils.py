@@ -0,0 +1,170 @@
+# audio_utils.py
+# Lightweight audio helpers: MP3 stream parsing without decoding, plus the MP3 -> PCM WAV stage
+import wave
+
+import miniaudio
+
+# Output format of the WAV files: 16 kHz, 16-bit, mono PCM
+WAV_SAMPLE_RATE = 16000
+WAV_SAMPLE_WIDTH = 2
+
+# Bitrates (kbit/s) for MPEG Layer III, indexed by the 4-bit bitrate field
+MPEG1_LAYER3_BITRATES = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320]
+MPEG2_LAYER3_BITRATES = [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+
+# Sample rates (Hz) indexed by the 2-bit version field, then the 2-bit sample rate field
+MPEG_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG-1
+    2: [22050, 24000, 16000],  # MPEG-2
+    0: [11025, 12000, 8000],   # MPEG-2.5
+}
+
+
+def parse_mp3_frame_header(header):
+    """Parse a 4-byte MPEG Layer III frame header into (frame_length, samples, sample_rate), or None if invalid"""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+
+    # Only Layer III (which is what Edge TTS produces); reject reserved/free-format values
+    if version not in MPEG_SAMPLE_RATES or layer != 1 or sample_rate_index == 3:
+        return None
+    if bitrate_index == 0 or bitrate_index == 15:
+        return None
+
+    sample_rate = MPEG_SAMPLE_RATES[version][sample_rate_index]
+    if version == 3:
+        bitrate = MPEG1_LAYER3_BITRATES[bitrate_index] * 1000
+        samples = 1152
+    else:
+        bitrate = MPEG2_LAYER3_BITRATES[bitrate_index] * 1000
+        samples = 576
+
+    frame_length = (samples // 8) * bitrate // sample_rate + padding
+    return frame_length, samples, sample_rate
+
+
+class MP3DurationParser:
+    """Incremental MP3 duration counter: feed it chunks as they arrive, read `duration` at any time"""
+
+    def __init__(self):
+        self.samples = 0
+        self.sample_rate = None
+        self.frames = 0
+        self.header = None
+        self._buffer = bytearray()
+        self._skip = 0
+        self._at_start = True
+
+    @property
+    def duration(self):
+        """Audio duration in seconds of the frames seen so far"""
+        if not self.sample_rate:
+            return 0.0
+        return self.samples / self.sample_rate
+
+    def feed(self, data):
+        """Consume the next chunk of the MP3 byte stream"""
+        # Skip the rest of a frame body (or tag) that started in an earlier chunk
+        if self._skip:
+            if len(data) <= self._skip:
+                self._skip -= len(data)
+                return
+            data = data[self._skip:]
+            self._skip = 0
+
+        buffer = self._buffer
+        buffer += data
+
+        while len(buffer) >= 4:
+            # ID3v2 tag at the start of the stream: 10-byte header with a syncsafe size
+            if self._at_start and buffer[:3] == b'ID3':
+                if len(buffer) < 10:
+                    return
+                tag_size = 10 + ((buffer[6] << 21) | (buffer[7] << 14) | (buffer[8] << 7) | buffer[9])
+                self._at_start = False
+                if not self._consume(tag_size):
+                    return
+                continue
+            self._at_start = False
+
+            frame = parse_mp3_frame_header(buffer[:4])
+            if frame is None:
+                # Lost sync: jump to the next possible frame start
+                next_sync = buffer.find(b'\xff', 1)
+                del buffer[:next_sync if next_sync != -1 else len(buffer)]
+                continue
+
+            frame_length, samples, sample_rate = frame
+            self.header = bytes(buffer[:4])
+            self.frames += 1
+            self.samples += samples
+            self.sample_rate = sample_rate
+            if not self._consume(frame_length):
+                return
+
+    def _consume(self, length):
+        """Drop `length` bytes from the stream; returns False if they extend past the buffered data"""
+        if len(self._buffer) >= length:
+            del self._buffer[:length]
+            return True
+        self._skip = length - len(self._buffer)
+        self._buffer.clear()
+        return False
+
+
+def silent_mp3_frames(header, seconds):
+    """Silent MP3 frames in the same format as `header`, lasting as close to `seconds` as whole frames allow"""
+    header = bytearray(header[:4])
+    header[1] |= 0x01  # no CRC
+    header[2] &= 0xFD  # no padding
+    frame_length, samples, sample_rate = parse_mp3_frame_header(header)
+
+    # All-zero side info and main data decode to digital silence
+    num_frames = round(seconds * sample_rate / samples)
+    return (bytes(header) + bytes(frame_length - 4)) * num_frames
+
+
+def probe_mp3_duration(path, chunk_size=64 * 1024):
+    """Duration in seconds of an MP3 file, from its frame headers only"""
+    parser = MP3DurationParser()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            parser.feed(chunk)
+    return parser.duration
+
+
+def decode_mp3_to_pcm(mp3_data, sample_rate=WAV_SAMPLE_RATE):
+    """Decode MP3 bytes to 16-bit mono PCM bytes at `sample_rate` (CPU-bound: run it in a worker process)"""
+    decoded = miniaudio.decode(
+        bytes(mp3_data),
+        output_format=miniaudio.SampleFormat.SIGNED16,
+        nchannels=1,
+        sample_rate=sample_rate
+    )
+    return decoded.samples.tobytes()
+
+
+def open_wav_writer(path, sample_rate=WAV_SAMPLE_RATE):
+    """Open a 16-bit mono PCM WAV file for writing (plain 44-byte header, so the data can be memory-mapped)"""
+    wav = wave.open(path, 'wb')
+    wav.setnchannels(1)
+    wav.setsampwidth(WAV_SAMPLE_WIDTH)
+    wav.setframerate(sample_rate)
+    return wav
+
+
+def transcode_mp3_to_wav(mp3_data, wav_path, sample_rate=WAV_SAMPLE_RATE):
+    """Decode MP3 bytes and write them as a PCM WAV file; returns the number of samples written"""
+    pcm = decode_mp3_to_pcm(mp3_data, sample_rate)
+    with open_wav_writer(wav_path, sample_rate) as wav:
+        wav.writeframes(pcm)
+    return len(pcm) // WAV_SAMPLE_WIDTH
@@ -0,0 +1,63 @@
+# parser_benchmark.py
+# Micro-benchmark of response_parser.DialogueParser over a corpus of recorded model responses
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_parser import DialogueParser
+
+DEFAULT_CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'responses')
+
+
+def load_corpus(corpus_dir):
+    """Map of file name -> response text for every .txt file in the corpus"""
+    corpus = {}
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.endswith('.txt'):
+            with open(os.path.join(corpus_dir, name), 'r', encoding='utf-8') as f:
+                corpus[name] = f.read()
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the dialogue response parser')
+    parser.add_argument('--corpus-dir', default=DEFAULT_CORPUS_DIR, help='Directory of recorded responses (.txt)')
+    parser.add_argument('--iterations', type=int, default=2000, help='Passes over the corpus')
+    parser.add_argument('--min-turns', type=int, default=8, help='Minimum turns for a valid conversation')
+
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus_dir)
+    if not corpus:
+        parser.error(f"No .txt responses found in '{args.corpus_dir}'")
+
+    # One verbose pass, to show what the parser makes of each response
+    dialogue_parser = DialogueParser(min_turns=args.min_turns)
+    for name, text in corpus.items():
+        segments, reasons = dialogue_parser.parse(text)
+        verdict = f"rejected ({', '.join(reasons)})" if reasons else "ok"
+        print(f"{name:<28} {len(segments):>3} turns  {verdict}")
+    print(dialogue_parser.summary())
+
+    # Timed passes
+    texts = list(corpus.values())
+    total_bytes = sum(len(text.encode('utf-8')) for text in texts)
+    dialogue_parser = DialogueParser(min_turns=args.min_turns)
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        for text in texts:
+            dialogue_parser.parse(text)
+    elapsed = time.perf_counter() - start
+
+    num_responses = args.iterations * len(texts)
+    print(f"\nParsed {num_responses} responses in {elapsed:.3f}s")
+    print(f"  {num_responses / elapsed:,.0f} responses/sec, {1e6 * elapsed / num_responses:.1f} µs/response")
+    print(f"  {args.iterations * total_bytes / elapsed / 1e6:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
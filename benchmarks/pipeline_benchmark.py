@@ -0,0 +1,195 @@
+# pipeline_benchmark.py
+# End-to-end benchmark of generate_dataset.py with the offline Gemini and TTS stand-ins, at increasing scales
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GENERATE_DATASET = os.path.join(REPO_DIR, 'generate_dataset.py')
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Concurrency for the benchmark runs; any generate_dataset.py option given after the benchmark's own overrides these
+DEFAULT_PIPELINE_ARGS = [
+    '--workers', '16',
+    '--max-concurrent-conversations', '16',
+    '--max-concurrent-segments', '64'
+]
+
+
+def git_commit():
+    """Short hash of the checked-out commit (with '+dirty' for local changes), or None outside a git checkout"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}+dirty" if dirty else commit
+
+
+def disk_usage(path):
+    """(files, apparent bytes, allocated bytes) under `path`"""
+    files = 0
+    apparent = 0
+    allocated = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            stat = os.stat(os.path.join(root, name))
+            files += 1
+            apparent += stat.st_size
+            allocated += getattr(stat, 'st_blocks', 0) * 512 or stat.st_size
+    return files, apparent, allocated
+
+
+def run_scale(args, pipeline_args, num_conversations, work_dir):
+    """Run generate_dataset.py once for `num_conversations` and measure it"""
+    output_dir = os.path.join(work_dir, f"n{num_conversations}")
+    metrics_file = os.path.join(work_dir, f"metrics-{num_conversations}.json")
+    log_file = os.path.join(work_dir, f"log-{num_conversations}.txt")
+    command = [
+        sys.executable, GENERATE_DATASET,
+        '--fake-client', '--fake-latency', str(args.gemini_latency), '--fake-jitter', str(args.gemini_jitter),
+        '--fake-error-rate', str(args.gemini_error_rate),
+        '--tts-backend', args.tts_backend, '--stub-latency', str(args.tts_latency), '--stub-jitter', str(args.tts_jitter),
+        '--stub-error-rate', str(args.tts_error_rate),
+        '--num-conversations', str(num_conversations), '--seed', str(args.seed),
+        '--output-dir', output_dir, '--metrics-file', metrics_file, '--progress-interval', '10'
+    ] + pipeline_args
+
+    with open(log_file, 'w', encoding='utf-8') as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, cwd=REPO_DIR)
+        # wait4 reports the resource usage of this run alone
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - start
+    exit_code = os.waitstatus_to_exitcode(status)
+    # The child is reaped; tell Popen, or it would try to wait for the pid again
+    process.returncode = exit_code
+
+    metrics = {'counters': {}, 'latency_sec': {}}
+    if os.path.exists(metrics_file):
+        with open(metrics_file, 'r', encoding='utf-8') as f:
+            metrics = json.load(f)
+    counters = metrics['counters']
+    latency = metrics['latency_sec']
+    files, apparent_bytes, allocated_bytes = disk_usage(output_dir)
+    conversations = counters.get('conversations_synthesized_total', 0)
+
+    result = {
+        'num_conversations': num_conversations,
+        'exit_code': exit_code,
+        'elapsed_sec': round(elapsed, 3),
+        'conversations': conversations,
+        'conversations_per_sec': round(conversations / elapsed, 3),
+        'segments': counters.get('segments_total', 0),
+        'segments_per_sec': round(counters.get('segments_total', 0) / elapsed, 3),
+        'audio_seconds_per_sec': round(counters.get('audio_seconds_total', 0) / elapsed, 3),
+        # Largest resident set of any single process of the run (the main process or one of its worker
+        # processes), not the total of the process tree; ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        'peak_rss_mb': round(usage.ru_maxrss / (1e6 if sys.platform == 'darwin' else 1e3), 1),
+        'cpu_sec': round(usage.ru_utime + usage.ru_stime, 3),
+        'files': files,
+        'files_per_conversation': round(files / max(conversations, 1), 2),
+        'bytes_written': apparent_bytes,
+        'bytes_allocated': allocated_bytes,
+        # Space lost to block rounding: the cost of many small files
+        'allocation_overhead': round(allocated_bytes / max(apparent_bytes, 1) - 1, 4),
+        'gemini_requests': counters.get('gemini_requests_total', 0),
+        'gemini_errors': counters.get('gemini_errors_total', 0),
+        'tts_requests': counters.get('tts_requests_total', 0),
+        'tts_errors': counters.get('tts_errors_total', 0),
+        'latency_p50_sec': {name: summary['p50'] for name, summary in latency.items()},
+        'latency_p99_sec': {name: summary['p99'] for name, summary in latency.items()}
+    }
+    if exit_code != 0:
+        result['log_file'] = log_file
+    return result
+
+
+def print_comparison(results, baseline_file):
+    """Change against an earlier results file, per scale"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    earlier = {result['num_conversations']: result for result in baseline['results']}
+    print(f"\nCompared with {baseline.get('commit') or baseline_file}:")
+    for result in results:
+        before = earlier.get(result['num_conversations'])
+        if not before:
+            continue
+        changes = []
+        for key in ('conversations_per_sec', 'segments_per_sec', 'peak_rss_mb', 'files_per_conversation'):
+            if before[key]:
+                changes.append(f"{key} {100 * (result[key] / before[key] - 1):+.1f}%")
+        print(f"  {result['num_conversations']:>7}: {', '.join(changes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark generate_dataset.py end to end with offline stand-ins for Gemini and Edge TTS. '
+                    'Unrecognized options are passed on to generate_dataset.py (e.g. --batch-size 4 --output-mode conversation).'
+    )
+    parser.add_argument('--scales', type=int, nargs='+', default=[10, 100, 1000], help='Conversation counts to run (default: 10 100 1000)')
+    parser.add_argument('--seed', type=int, default=1, help='Run seed, so every commit benchmarks the same plan')
+    parser.add_argument('--gemini-latency', type=float, default=0.5, help='Simulated Gemini latency (seconds)')
+    parser.add_argument('--gemini-jitter', type=float, default=0.1, help='Random +/- variation of the Gemini latency (seconds)')
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0, help='Fraction of Gemini requests that fail with 429')
+    parser.add_argument('--tts-backend', choices=['stub', 'local'], default='stub', help='Offline TTS backend (default: stub)')
+    parser.add_argument('--tts-latency', type=float, default=0.2, help='Simulated TTS latency of the stub backend (seconds)')
+    parser.add_argument('--tts-jitter', type=float, default=0.05, help='Random +/- variation of the TTS latency (seconds)')
+    parser.add_argument('--tts-error-rate', type=float, default=0.0, help='Fraction of TTS requests that fail')
+    parser.add_argument('--work-dir', default=None, help='Where the runs write their output (default: a temporary directory)')
+    parser.add_argument('--keep-output', action='store_true', help='Keep each run\'s dataset instead of deleting it after measuring')
+    parser.add_argument('--output', default=None, help='Results JSON (default: benchmarks/results/pipeline_<commit>.json)')
+    parser.add_argument('--baseline', default=None, help='Earlier results JSON to compare against')
+
+    args, pipeline_args = parser.parse_known_args()
+    # The stub's silent MP3 is passed through as is; the local backend only produces WAV
+    audio_format = 'wav' if args.tts_backend == 'local' else 'mp3'
+    pipeline_args = DEFAULT_PIPELINE_ARGS + ['--audio-format', audio_format] + pipeline_args
+
+    commit = git_commit()
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"pipeline_{commit or datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='pipeline_benchmark_')
+    os.makedirs(work_dir, exist_ok=True)
+
+    print(f"{'conversations':>13} {'elapsed':>9} {'conv/s':>8} {'seg/s':>8} {'max RSS':>10} {'files/conv':>10} {'overhead':>9}")
+    results = []
+    for num_conversations in sorted(args.scales):
+        result = run_scale(args, pipeline_args, num_conversations, work_dir)
+        results.append(result)
+        print(f"{num_conversations:>13} {result['elapsed_sec']:>8.1f}s {result['conversations_per_sec']:>8.2f} "
+              f"{result['segments_per_sec']:>8.1f} {result['peak_rss_mb']:>7.1f} MB {result['files_per_conversation']:>10.2f} "
+              f"{100 * result['allocation_overhead']:>8.1f}%")
+        if result['exit_code'] != 0:
+            print(f"❌ Run failed with exit code {result['exit_code']}, see {result['log_file']}")
+            break
+        if not args.keep_output:
+            shutil.rmtree(os.path.join(work_dir, f"n{num_conversations}"), ignore_errors=True)
+
+    report = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'platform': {'python': platform.python_version(), 'system': platform.platform(), 'cpus': os.cpu_count()},
+        'config': dict(vars(args), pipeline_args=pipeline_args),
+        'results': results
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved: {output}")
+
+    if args.baseline:
+        print_comparison(results, args.baseline)
+    # A failed run's log stays for inspection
+    if not args.work_dir and not args.keep_output and all(result['exit_code'] == 0 for result in results):
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# convert_to_shards.py
+# Packs an existing per-directory audio dataset (generate_audio.py output) into tar shards
+import argparse
+import csv
+import os
+import shutil
+
+from generate_audio import METADATA_FIELDNAMES
+from partition import file_id_sort_key
+from shard_writer import ShardWriter, load_index, sample_member_name
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a per-conversation audio dataset into tar shards with an index')
+    parser.add_argument('--input-dir', required=True, help='Audio dataset directory containing dataset_metadata.csv')
+    parser.add_argument('--shard-dir', required=True, help='Output directory for the shards')
+    parser.add_argument('--max-shard-mb', type=float, default=1024, help='Size at which a new shard is started, in MB (default: 1024)')
+    parser.add_argument('--delete-source', action='store_true', help='Remove each conversation directory once its shard is complete')
+
+    args = parser.parse_args()
+
+    metadata_file = os.path.join(args.input_dir, 'dataset_metadata.csv')
+    if not os.path.exists(metadata_file):
+        parser.error(f"No dataset_metadata.csv in '{args.input_dir}'")
+    with open(metadata_file, 'r', newline='', encoding='utf-8') as f:
+        metadata = {row['file_id']: row for row in csv.DictReader(f)}
+
+    def delete_sources(shard_name, file_ids):
+        # Only a renamed, indexed shard survives an interruption, so sources go once their shard is complete
+        for file_id in file_ids:
+            shutil.rmtree(os.path.join(args.input_dir, file_id), ignore_errors=True)
+
+    writer = ShardWriter(args.shard_dir, int(args.max_shard_mb * 1e6), delete_sources if args.delete_source else None)
+    packed = skipped = 0
+    try:
+        for file_id in sorted(metadata, key=file_id_sort_key):
+            conv_dir = os.path.join(args.input_dir, file_id)
+            if writer.contains(file_id):
+                # Packed by an earlier, interrupted conversion
+                skipped += 1
+            elif os.path.isdir(conv_dir):
+                writer.add_conversation_dir(file_id, conv_dir)
+                packed += 1
+            else:
+                print(f"Missing directory for {file_id}, skipping")
+    finally:
+        writer.close()
+
+    # Metadata of the sharded dataset points into the shards instead of at per-conversation files
+    index = load_index(args.shard_dir)
+    rows = []
+    for file_id in sorted(index, key=file_id_sort_key):
+        if file_id not in metadata:
+            continue
+        rows.append(dict(
+            metadata[file_id],
+            audio_directory=os.path.join(args.shard_dir, index[file_id][0]['shard']),
+            diarization_file=sample_member_name(file_id, f"{file_id}_diarization.json"),
+            transcript_file=sample_member_name(file_id, f"{file_id}_transcript.csv")
+        ))
+
+    shard_metadata_file = os.path.join(args.shard_dir, 'dataset_metadata.csv')
+    with open(shard_metadata_file, 'w', newline='', encoding='utf-8') as f:
+        metadata_writer = csv.DictWriter(f, fieldnames=METADATA_FIELDNAMES)
+        metadata_writer.writeheader()
+        metadata_writer.writerows(rows)
+
+    shards = {index_rows[0]['shard'] for index_rows in index.values()}
+    print(f"Packed {packed} conversations ({skipped} already packed) into {len(shards)} shards in {args.shard_dir}")
+    print(f"Index: {writer.index_file}")
+    print(f"Dataset metadata saved: {shard_metadata_file}")
+
+
+if __name__ == "__main__":
+    main()
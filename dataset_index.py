@@ -0,0 +1,168 @@
+# dataset_index.py
+# SQLite index of finished conversations and their segments, updated as each conversation completes
+import json
+import os
+import sqlite3
+import tarfile
+from datetime import datetime
+
+INDEX_FILENAME = 'index.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    file_id TEXT PRIMARY KEY,
+    scam_type TEXT NOT NULL,
+    language TEXT NOT NULL,
+    duration_sec REAL NOT NULL,
+    num_segments INTEGER NOT NULL,
+    text_chars INTEGER NOT NULL,
+    text_words INTEGER NOT NULL,
+    victim_voice TEXT,
+    scammer_voice TEXT,
+    victim_gender TEXT,
+    scammer_gender TEXT,
+    audio_format TEXT,
+    tts_engine TEXT,
+    recording_conditions TEXT,
+    overlap_sec REAL NOT NULL DEFAULT 0,
+    audio_dir TEXT,
+    audio_file TEXT,
+    diarization_file TEXT,
+    transcript_file TEXT,
+    indexed_at TEXT NOT NULL
+);
+-- Covers the usual coverage questions (stratum and genders, summed durations) without touching the table
+CREATE INDEX IF NOT EXISTS conversations_stratum ON conversations (
+    language, scam_type, scammer_gender, victim_gender, duration_sec, num_segments, overlap_sec
+);
+
+CREATE TABLE IF NOT EXISTS segments (
+    file_id TEXT NOT NULL REFERENCES conversations (file_id) ON DELETE CASCADE,
+    segment_index INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    speaker TEXT,
+    voice TEXT,
+    gender TEXT,
+    rate TEXT,
+    volume TEXT,
+    pitch TEXT,
+    start_sec REAL NOT NULL,
+    end_sec REAL NOT NULL,
+    duration_sec REAL NOT NULL,
+    text_chars INTEGER NOT NULL,
+    text_words INTEGER NOT NULL,
+    interrupted INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (file_id, segment_index)
+);
+CREATE INDEX IF NOT EXISTS segments_voice ON segments (role, gender, voice);
+"""
+
+# Columns written by add_conversation, in the order of its rows
+CONVERSATION_FIELDS = [
+    'file_id', 'scam_type', 'language', 'duration_sec', 'num_segments', 'text_chars', 'text_words',
+    'victim_voice', 'scammer_voice', 'victim_gender', 'scammer_gender', 'audio_format', 'tts_engine',
+    'recording_conditions', 'overlap_sec', 'audio_dir', 'audio_file', 'diarization_file', 'transcript_file', 'indexed_at'
+]
+SEGMENT_FIELDS = [
+    'file_id', 'segment_index', 'role', 'speaker', 'voice', 'gender', 'rate', 'volume', 'pitch',
+    'start_sec', 'end_sec', 'duration_sec', 'text_chars', 'text_words', 'interrupted'
+]
+
+# Columns the query CLI may filter and group conversations by
+CONVERSATION_COLUMNS = [
+    'scam_type', 'language', 'victim_voice', 'scammer_voice', 'victim_gender', 'scammer_gender',
+    'audio_format', 'tts_engine', 'recording_conditions'
+]
+
+
+class DatasetIndex:
+    """Conversations and segments of an audio dataset as SQLite tables, for coverage and duration queries.
+
+    Each conversation is written in its own transaction, so the index is always consistent with the
+    conversations that completed, even if a run is killed. Re-indexing a conversation replaces it.
+    A writable index may be used from another thread than the one that opened it (e.g. a single-thread
+    executor that keeps commits off the event loop), as long as only one thread uses it at a time.
+    """
+
+    def __init__(self, path, read_only=False):
+        self.path = path
+        if read_only:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            return
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL keeps queries from other processes working while a run is writing
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self.conn.executescript(SCHEMA)
+
+    def add_conversation(self, scam_type, audio_format, voice_plan, diarization, result):
+        """Index one finished conversation from its voice plan, diarization JSON and synthesis result"""
+        segments = diarization['segments']
+        genders = diarization['genders']
+        conversation_row = (
+            diarization['file_id'], scam_type, diarization['language'], diarization['duration'], len(segments),
+            sum(len(segment['text']) for segment in segments), sum(len(segment['text'].split()) for segment in segments),
+            diarization['voices']['victim'], diarization['voices']['scammer'], genders['victim'], genders['scammer'],
+            audio_format, result.get('tts_engine', 'Edge TTS'), result.get('recording_conditions', 'synthetic_tts'),
+            sum(overlap['end'] - overlap['start'] for overlap in diarization.get('overlaps', [])),
+            result['audio_dir'], result['audio_file'], result['diarization_file'], result['transcript_file'],
+            datetime.now().isoformat()
+        )
+        # Diarization segments are the planned segments in order; a finished conversation has all of them
+        segment_rows = [
+            (
+                diarization['file_id'], i, segment['role'], segment['speaker'], segment['voice'], genders.get(segment['role']),
+                plan['settings']['rate'], plan['settings']['volume'], plan['settings']['pitch'],
+                segment['start'], segment['end'], round(segment['end'] - segment['start'], 3),
+                len(segment['text']), len(segment['text'].split()), int(segment.get('interrupted', False))
+            )
+            for i, (segment, plan) in enumerate(zip(segments, voice_plan['segments']))
+        ]
+        with self.conn:
+            self.conn.execute('DELETE FROM segments WHERE file_id = ?', (diarization['file_id'],))
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO conversations ({', '.join(CONVERSATION_FIELDS)}) "
+                f"VALUES ({', '.join('?' * len(CONVERSATION_FIELDS))})",
+                conversation_row
+            )
+            self.conn.executemany(
+                f"INSERT INTO segments ({', '.join(SEGMENT_FIELDS)}) VALUES ({', '.join('?' * len(SEGMENT_FIELDS))})",
+                segment_rows
+            )
+
+    def contains(self, file_id):
+        return self.conn.execute('SELECT 1 FROM conversations WHERE file_id = ?', (file_id,)).fetchone() is not None
+
+    def summarize(self, filters=None, group_by=()):
+        """Conversation count, hours and segment count per group, for conversations matching `filters` ({column: value})"""
+        filters = filters or {}
+        for column in list(filters) + list(group_by):
+            if column not in CONVERSATION_COLUMNS:
+                raise ValueError(f"Unknown column: {column}")
+        where = ' AND '.join(f"{column} = ?" for column in filters) or '1'
+        groups = ', '.join(group_by)
+        query = (f"SELECT {groups + ', ' if groups else ''}COUNT(*), COALESCE(SUM(duration_sec), 0) / 3600.0, "
+                 f"COALESCE(SUM(num_segments), 0), COALESCE(SUM(overlap_sec), 0) / 3600.0 "
+                 f"FROM conversations WHERE {where}"
+                 + (f" GROUP BY {groups} ORDER BY {groups}" if groups else ''))
+        return self.conn.execute(query, list(filters.values())).fetchall()
+
+    def query(self, sql, parameters=()):
+        """Rows of an arbitrary read-only query, with the column names"""
+        cursor = self.conn.execute(sql, parameters)
+        return [column[0] for column in cursor.description or []], cursor.fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+def load_diarization(result):
+    """Diarization JSON of a synthesis result, from its conversation directory or from its tar shard"""
+    if os.path.exists(result['diarization_file']):
+        with open(result['diarization_file'], 'r', encoding='utf-8') as f:
+            return json.load(f)
+    if os.path.isfile(result['audio_dir']) and tarfile.is_tarfile(result['audio_dir']):
+        with tarfile.open(result['audio_dir']) as tar:
+            return json.load(tar.extractfile(result['diarization_file']))
+    return None
@@ -2,35 +2,81 @@
 import json
 import os
 import asyncio
-import edge_tts
 import random
 import argparse
+import functools
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 import csv
 
+from audio_utils import (
+    WAV_SAMPLE_RATE, WAV_SAMPLE_WIDTH, MP3DurationParser, decode_mp3_to_pcm,
+    open_wav_writer, probe_mp3_duration, silent_mp3_frames, transcode_mp3_to_wav
+)
+from dataset_index import INDEX_FILENAME, DatasetIndex, load_diarization
+from manifest import Manifest, content_hash
+from metrics import Metrics, ProgressReporter, add_metrics_arguments
+from partition import add_partition_arguments, file_id_sort_key, item_rng, owns, resolve_partition_arguments
+from shard_writer import ShardWriter, sample_member_name
+from stubs import StubCommunicate
+from telephony import TelephonyAugmenter, add_telephony_arguments, augment_wav_files
+from timeline_mixer import TimelineMixer, TurnTaking, add_turn_taking_arguments, overlap_intervals
+from tts_backends import EdgeBackend, LocalBackend, StubBackend
+from tts_cache import TTSCache
+
+METADATA_FIELDNAMES = [
+    'file_id', 'filename', 'duration_sec', 'num_speakers', 'speaker_roles',
+    'source_type', 'recording_conditions', 'audio_format', 'audio_directory',
+    'diarization_file', 'transcript_file', 'victim_voice', 'scammer_voice', 'notes'
+]
+
 class AudioConversationGenerator:
-    def __init__(self):
-        # Expanded voice list with distinct voices for different roles
-        self.voices = {
-            "hindi": {
-                "victim_male": ["hi-IN-MadhurNeural"],
-                "victim_female": ["hi-IN-SwaraNeural"],
-                "scammer_male": ["hi-IN-MadhurNeural"],
-                "scammer_female": ["hi-IN-SwaraNeural"]
-            },
-            "hinglish": {
-                "victim_male": ["en-IN-PrabhatNeural", "en-IN-SameerNeural"],
-                "victim_female": ["en-IN-NeerjaNeural", "en-IN-ShrutiNeural"],
-                "scammer_male": ["hi-IN-MadhurNeural", "en-GB-RyanNeural"],
-                "scammer_female": ["hi-IN-SwaraNeural", "en-GB-SoniaNeural"]
-            },
-            "english": {
-                "victim_male": ["en-US-AndrewNeural", "en-GB-RyanNeural"],
-                "victim_female": ["en-US-AriaNeural", "en-GB-SoniaNeural"],
-                "scammer_male": ["en-US-BrianNeural", "en-GB-ThomasNeural"],
-                "scammer_female": ["en-US-JennyNeural", "en-GB-HollieNeural"]
-            }
-        }
+    def __init__(self, backend=None, max_concurrent_segments=8, max_segments_per_conversation=4, decode_workers=None, manifest=None, index=None, cache=None, shard_writer=None, augmenter=None, turn_taking=None, seed=None, metrics=None):
+        # Speech synthesizer (tts_backends.TTSBackend); Edge TTS unless another one is given
+        self.backend = backend or EdgeBackend()
+        # MP3 backends are decoded for WAV output; PCM backends are written as they are
+        self.pcm_output = self.backend.capabilities()['output_format'] == 'pcm'
+        
+        # Global cap on in-flight TTS requests across all conversations
+        self.segment_semaphore = asyncio.Semaphore(max_concurrent_segments)
+        self.max_segments_per_conversation = max_segments_per_conversation
+        
+        # MP3 -> WAV decoding is CPU-bound, so it runs in worker processes off the event loop
+        self.decode_workers = decode_workers
+        self.decode_pool = None
+        
+        # Optional manifest.Manifest; completed conversations and segments recorded there are skipped
+        self.manifest = manifest
+        
+        # Optional dataset_index.DatasetIndex; every completed conversation is added to it
+        # SQLite commits block on fsync, so they run on one worker thread that owns the index
+        self.index = index
+        self.index_executor = None
+        
+        # Optional tts_cache.TTSCache in front of the TTS service
+        self.cache = cache
+        
+        # Optional shard_writer.ShardWriter, with shard_finished as its callback; finished conversations are packed
+        # into tar shards and their directories removed once their shard is complete
+        self.shard_writer = shard_writer
+        self.pending_shard = {}  # file_id -> (conversation directory, record callback), until its shard is complete
+        
+        # Optional telephony.TelephonyAugmenter; finished WAV audio is degraded to a phone line in the process pool
+        self.augmenter = augmenter
+        
+        # Optional timeline_mixer.TurnTaking; speakers overlap and interrupt each other in conversation WAV files
+        self.turn_taking = turn_taking
+        
+        # Run seed for voice and prosody choices (see partition.item_rng); None draws from the global RNG
+        self.seed = seed
+        
+        # TTS latency, fallbacks, bytes written and audio produced (metrics.Metrics)
+        self.metrics = metrics or Metrics()
+        
+        # Voice list of the backend, with distinct voices for different roles
+        self.voices = self.backend.voices()
         
         # Voice characteristics for more realistic conversations
         self.voice_settings = {
@@ -46,45 +92,327 @@ class AudioConversationGenerator:
             }
         }
         
-    async def generate_audio_segment(self, text, voice, output_file, rate="+0%", volume="+0%", pitch="+0Hz"):
-        """Generate audio for a single segment using Edge TTS"""
-        try:
-            communicate = edge_tts.Communicate(text, voice, rate=rate, volume=volume, pitch=pitch)
-            await communicate.save(output_file)
-            return True
-        except Exception as e:
-            print(f"Error generating audio for '{text[:50]}...': {e}")
+    async def stream_audio_segment(self, text, voice, rate="+0%", volume="+0%", pitch="+0Hz"):
+        """Yield the audio chunks of a single segment from the TTS cache, or else from the TTS backend"""
+        cache_writer = None
+        if self.cache:
+            cache_key = self.cache.key(text, voice, rate, volume, pitch, backend=self.backend.name)
+            cached_file = self.cache.lookup(cache_key)
+            if cached_file:
+                self.metrics.inc('tts_cache_hits_total')
+                with open(cached_file, 'rb') as f:
+                    while True:
+                        data = f.read(64 * 1024)
+                        if not data:
+                            return
+                        yield data
+            cache_writer = self.cache.writer(cache_key)
+        
+        async with self.segment_semaphore:
+            received_audio = False
+            try:
+                self.metrics.inc('tts_requests_total')
+                request_start = time.perf_counter()
+                async for data in self.backend.stream(text, voice, rate=rate, volume=volume, pitch=pitch):
+                    if not received_audio:
+                        self.metrics.observe('tts_first_byte_seconds', time.perf_counter() - request_start)
+                    received_audio = True
+                    if cache_writer:
+                        cache_writer.write(data)
+                    yield data
+                if received_audio:
+                    # Includes the time the consumer took between chunks (e.g. disk writes)
+                    self.metrics.observe('tts_request_seconds', time.perf_counter() - request_start)
+                    if cache_writer:
+                        cache_writer.commit()
+                    return
+                raise ValueError("No audio was received")
+            except BaseException as e:
+                # Only complete streams with the requested prosody are cached
+                if cache_writer:
+                    cache_writer.abort()
+                # Audio already handed to the caller cannot be taken back, so only retry clean failures
+                if received_audio or not isinstance(e, Exception):
+                    raise
+                print(f"Error generating audio for '{text[:50]}...': {e}")
+                self.metrics.inc('tts_errors_total')
+            
             # Fallback to basic generation without modifications
+            self.metrics.inc('tts_fallbacks_total')
             try:
-                communicate = edge_tts.Communicate(text, voice)
-                await communicate.save(output_file)
-                return True
+                self.metrics.inc('tts_requests_total')
+                async for data in self.backend.stream(text, voice):
+                    received_audio = True
+                    yield data
+                if not received_audio:
+                    raise ValueError("No audio was received")
             except Exception as e2:
                 print(f"Fallback also failed: {e2}")
-                return False
+                self.metrics.inc('tts_errors_total')
+                raise
+    
+    def _get_decode_pool(self):
+        """Process pool for MP3 -> WAV decoding and telephony augmentation, created on first use"""
+        if self.decode_pool is None:
+            self.decode_pool = ProcessPoolExecutor(max_workers=self.decode_workers)
+        return self.decode_pool
+    
+    def _get_index_executor(self):
+        """Single thread for the SQLite index writes, created on first use"""
+        if self.index_executor is None:
+            self.index_executor = ThreadPoolExecutor(max_workers=1)
+        return self.index_executor
+    
+    def _index_conversation(self, *args):
+        """Add a conversation to the index on the index thread; returns an awaitable"""
+        return asyncio.get_running_loop().run_in_executor(self._get_index_executor(), self.index.add_conversation, *args)
+    
+    def _backfill_index(self, file_id, scam_type, audio_format, record):
+        """Index a conversation that finished before the index existed (runs on the index thread)"""
+        if self.index.contains(file_id):
+            return
+        diarization_json = load_diarization(record['result'])
+        if diarization_json:
+            self.index.add_conversation(scam_type, audio_format, record['voice_plan'], diarization_json, record['result'])
+    
+    def close(self):
+        """Shut down the decode and synthesis worker processes, complete the last shard and finish the index writes"""
+        if self.decode_pool is not None:
+            self.decode_pool.shutdown()
+            self.decode_pool = None
+        self.backend.close()
+        if self.shard_writer is not None:
+            self.shard_writer.close()
+        if self.index_executor is not None:
+            self.index_executor.shutdown()
+            self.index_executor = None
+    
+    async def generate_audio_segment(self, text, voice, output_file, rate="+0%", volume="+0%", pitch="+0Hz", audio_format="mp3"):
+        """Generate audio for a single segment with the TTS backend; returns its duration in seconds, or None on failure"""
+        # MP3 from the backend is collected and decoded in the process pool for WAV; PCM is streamed straight into the WAV file
+        mp3_data = bytearray()
+        duration_parser = MP3DurationParser()
+        try:
+            if audio_format == "mp3" and self.cache:
+                # Cached MP3 segments are hardlinked (or reflinked) into place rather than rewritten
+                cache_key = self.cache.key(text, voice, rate, volume, pitch, backend=self.backend.name)
+                if self.cache.contains(cache_key) and self.cache.link_into(cache_key, output_file):
+                    return self._count_segment(output_file, probe_mp3_duration(output_file))
+            
+            if audio_format == "wav" and self.pcm_output:
+                num_samples = 0
+                write_seconds = 0.0
+                with open_wav_writer(output_file) as wav:
+                    async for data in self.stream_audio_segment(text, voice, rate=rate, volume=volume, pitch=pitch):
+                        write_start = time.perf_counter()
+                        wav.writeframes(data)
+                        write_seconds += time.perf_counter() - write_start
+                        num_samples += len(data) // WAV_SAMPLE_WIDTH
+                self.metrics.observe('file_write_seconds', write_seconds)
+                return self._count_segment(output_file, num_samples / WAV_SAMPLE_RATE)
+            
+            if audio_format == "wav":
+                async for data in self.stream_audio_segment(text, voice, rate=rate, volume=volume, pitch=pitch):
+                    mp3_data += data
+                with self.metrics.timer('wav_transcode_seconds'):
+                    num_samples = await asyncio.get_running_loop().run_in_executor(
+                        self._get_decode_pool(), transcode_mp3_to_wav, mp3_data, output_file
+                    )
+                return self._count_segment(output_file, num_samples / WAV_SAMPLE_RATE)
+            
+            # Measure the duration from the MP3 frame headers while the stream is written to disk
+            # An earlier run may have hardlinked the cached file into place: replace it, never write through it
+            write_seconds = 0.0
+            tmp_file = f"{output_file}.tmp"
+            with open(tmp_file, 'wb') as f:
+                async for data in self.stream_audio_segment(text, voice, rate=rate, volume=volume, pitch=pitch):
+                    write_start = time.perf_counter()
+                    f.write(data)
+                    write_seconds += time.perf_counter() - write_start
+                    duration_parser.feed(data)
+            os.replace(tmp_file, output_file)
+            self.metrics.observe('file_write_seconds', write_seconds)
+        except Exception as e:
+            print(f"Failed to write '{output_file}': {e}")
+            if os.path.exists(f"{output_file}.tmp"):
+                os.remove(f"{output_file}.tmp")
+            self.metrics.inc('segments_failed_total')
+            return None
+        
+        return self._count_segment(output_file, duration_parser.duration)
+    
+    def _count_segment(self, output_file, duration):
+        """Record a finished segment file in the metrics; returns its duration"""
+        self.metrics.inc('segments_total')
+        self.metrics.inc('audio_seconds_total', duration)
+        self.metrics.inc('bytes_written_total', os.path.getsize(output_file))
+        return duration
+    
+    async def stream_conversation_audio(self, segment_plan, audio_file, audio_format="mp3"):
+        """Stream all segments, in order and separated by generated silence, into a single audio file.
+        
+        Up to max_segments_per_conversation segments are synthesized ahead of the one being written;
+        their chunks wait in per-segment queues, so memory is bounded by that window rather than by
+        the length of the conversation. Returns a (start, end) pair, or None if it failed, per segment.
+        """
+        window = self.max_segments_per_conversation
+        queues = [asyncio.Queue() for _ in segment_plan]
+        tasks = {}
+        
+        async def produce(plan, queue):
+            try:
+                async for data in self.stream_audio_segment(
+                    plan['segment']['text'],
+                    plan['voice'],
+                    rate=plan['settings']["rate"],
+                    volume=plan['settings']["volume"],
+                    pitch=plan['settings']["pitch"]
+                ):
+                    queue.put_nowait(data)
+                queue.put_nowait(None)
+            except Exception as e:
+                queue.put_nowait(e)
+        
+        def start(j):
+            if j < len(segment_plan) and j not in tasks:
+                tasks[j] = asyncio.create_task(produce(segment_plan[j], queues[j]))
+        
+        async def segment_chunks(i):
+            """Chunks of segment i, in order, as they arrive; raises the error of a stream that failed, even part-way"""
+            for j in range(i, i + window):
+                start(j)
+            while True:
+                item = await queues[i].get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    tasks.pop(i)
+                    queues[i] = None
+                    raise item
+                yield item
+            await tasks.pop(i)
+            queues[i] = None
+        
+        try:
+            if audio_format == "wav":
+                return await self._write_conversation_wav(segment_plan, audio_file, segment_chunks)
+            return await self._write_conversation_mp3(segment_plan, audio_file, segment_chunks)
+        finally:
+            for task in tasks.values():
+                task.cancel()
+    
+    async def _write_conversation_mp3(self, segment_plan, audio_file, segment_chunks):
+        """Pass the MP3 chunks straight through to the file, with silent frames for the pauses"""
+        # Offsets come from the same byte stream that is written to the file
+        duration_parser = MP3DurationParser()
+        timings = []
+        pending_pause = 0.0
+        
+        with open(audio_file, 'wb') as f:
+            for i, plan in enumerate(segment_plan):
+                # A segment is held back until its stream has finished, so a dropped stream never leaves partial audio
+                mp3_data = bytearray()
+                try:
+                    async for data in segment_chunks(i):
+                        mp3_data += data
+                except Exception as e:
+                    print(f"Failed to synthesize segment {i+1}: {e}")
+                    mp3_data = None
+                
+                if not mp3_data:
+                    timings.append(None)
+                    continue
+                
+                # Insert the pause only once this segment actually has audio
+                if pending_pause:
+                    silence = silent_mp3_frames(duration_parser.header, pending_pause)
+                    f.write(silence)
+                    duration_parser.feed(silence)
+                segment_start = duration_parser.duration
+                f.write(mp3_data)
+                duration_parser.feed(mp3_data)
+                timings.append((segment_start, duration_parser.duration))
+                pending_pause = plan['pause']
+        
+        return timings
+    
+    async def _write_conversation_wav(self, segment_plan, audio_file, segment_chunks):
+        """Decode each segment in the process pool (unless the backend delivers PCM) and mix it onto the conversation's timeline"""
+        loop = asyncio.get_running_loop()
+        added = []  # Index in segment_plan of every segment on the timeline
+        pending_pause = 0.0
+        
+        with open_wav_writer(audio_file) as wav:
+            mixer = TimelineMixer(wav)
+            for i, plan in enumerate(segment_plan):
+                mp3_data = bytearray()
+                try:
+                    async for data in segment_chunks(i):
+                        mp3_data += data
+                except Exception as e:
+                    # Part of a turn is not the turn: leave it out, so the conversation stays failed and is retried
+                    print(f"Failed to synthesize segment {i+1}: {e}")
+                    continue
+                
+                pcm = b''
+                if self.pcm_output:
+                    pcm = bytes(mp3_data)
+                elif mp3_data:
+                    try:
+                        pcm = await loop.run_in_executor(self._get_decode_pool(), decode_mp3_to_pcm, mp3_data)
+                    except Exception as e:
+                        print(f"Failed to decode segment {i+1}: {e}")
+                
+                if not pcm:
+                    continue
+                
+                mixer.add(pcm, pending_pause, plan.get('turn'))
+                added.append(i)
+                pending_pause = plan['pause']
+            intervals = mixer.close()
+        
+        timings = [None] * len(segment_plan)
+        for i, interval in zip(added, intervals):
+            timings[i] = interval
+        for position in mixer.interrupted:
+            segment_plan[added[position]]['interrupted'] = True
+        return timings
+    
+    def voice_pairs(self, language):
+        """Every (victim_voice, scammer_voice, victim_gender, scammer_gender) combination for a language"""
+        voices = self.voices[language]
+        female_victim = [(victim, scammer, "female", "male") for victim in voices["victim_female"] for scammer in voices["scammer_male"]]
+        male_victim = [(victim, scammer, "male", "female") for victim in voices["victim_male"] for scammer in voices["scammer_female"]]
+        
+        # Alternate the two gender pairings, so consecutive voice slots stay gender balanced
+        pairs = []
+        for i in range(max(len(female_victim), len(male_victim))):
+            pairs.extend(combinations[i] for combinations in (female_victim, male_victim) if i < len(combinations))
+        return pairs
     
-    def assign_voices(self, language):
+    def assign_voices(self, language, rng=random, voice_slot=None):
         """Assign distinct voices to victim and scammer"""
+        if voice_slot is not None:
+            # Planned conversations (see quota_planner) take the language's voice pairs in turn
+            pairs = self.voice_pairs(language)
+            return pairs[voice_slot % len(pairs)]
+        
         # Assign genders randomly but ensure they're different
-        victim_gender = random.choice(["male", "female"])
-        scammer_gender = random.choice(["male", "female"])
+        victim_gender = rng.choice(["male", "female"])
+        scammer_gender = "female" if victim_gender == "male" else "male"
         
         # Get available voices for each role
         victim_voice_key = f"victim_{victim_gender}"
         scammer_voice_key = f"scammer_{scammer_gender}"
         
-        victim_voice = random.choice(self.voices[language][victim_voice_key])
-        scammer_voice = random.choice(self.voices[language][scammer_voice_key])
-        
-        # Ensure voices are different
-        while victim_voice == scammer_voice:
-            scammer_voice = random.choice(self.voices[language][scammer_voice_key])
+        victim_voice = rng.choice(self.voices[language][victim_voice_key])
+        scammer_voice = rng.choice(self.voices[language][scammer_voice_key])
         
         # print(f"Assigned voices - Victim ({victim_gender}): {victim_voice}, Scammer ({scammer_gender}): {scammer_voice}")
         
         return victim_voice, scammer_voice, victim_gender, scammer_gender
     
-    def get_voice_settings(self, role, gender):
+    def get_voice_settings(self, role, gender, rng=random):
         """Get voice settings based on role and gender"""
         base_settings = self.voice_settings[role]
         
@@ -95,92 +423,206 @@ class AudioConversationGenerator:
             pitch_variations = ["+0Hz", "+5Hz", "+10Hz", "+15Hz"]
         
         return {
-            "rate": random.choice(base_settings["rate"]),
-            "volume": random.choice(base_settings["volume"]),
-            "pitch": random.choice(pitch_variations)
+            "rate": rng.choice(base_settings["rate"]),
+            "volume": rng.choice(base_settings["volume"]),
+            "pitch": rng.choice(pitch_variations)
+        }
+    
+    def plan_voices(self, conversation, rng=random):
+        """Draw the voices, prosody and pauses for a whole conversation.
+        
+        Every random choice is made here, up front and in segment order, so the output does not
+        depend on the order in which concurrent TTS requests happen to complete. Passing a seeded
+        random.Random makes the plan reproducible.
+        """
+        # Assign distinct voices
+        victim_voice, scammer_voice, victim_gender, scammer_gender = self.assign_voices(conversation['language'], rng, conversation.get('voice_slot'))
+        
+        segments = []
+        for segment in conversation['segments']:
+            # Assign voice based on role
+            if segment['role'] == 'victim':
+                voice = victim_voice
+                gender = victim_gender
+            else:  # scammer
+                voice = scammer_voice
+                gender = scammer_gender
+            
+            segments.append({
+                'voice': voice,
+                # Get voice settings for this role
+                'settings': self.get_voice_settings(segment['role'], gender, rng),
+                'pause': rng.uniform(0.3, 1.0)
+            })
+        
+        return {
+            'voices': {'victim': victim_voice, 'scammer': scammer_voice},
+            'genders': {'victim': victim_gender, 'scammer': scammer_gender},
+            'segments': segments
         }
     
-    async def generate_conversation_audio(self, conversation_file, output_dir, audio_format="wav"):
-        """Generate complete audio conversation from JSON"""
+    async def generate_conversation_audio(self, conversation_file, output_dir, audio_format="wav", output_mode="segments"):
+        """Generate complete audio conversation from JSON (one file per segment, or one file per conversation)"""
         
         with open(conversation_file, 'r', encoding='utf-8') as f:
             conversation = json.load(f)
         
+        return await self.synthesize_conversation(conversation, output_dir, audio_format, output_mode)
+    
+    async def synthesize_conversation(self, conversation, output_dir, audio_format="wav", output_mode="segments"):
+        """Generate complete audio for an already loaded conversation dict"""
         file_id = conversation['file_id']
         language = conversation['language']
+        conv_dir = os.path.join(output_dir, file_id)
+        
+        # The same conversation rendered the same way always maps to the same manifest entry
+        # Other backends and augmentation render different audio; keys without them match manifests written before they existed
+        key_parts = [conversation, audio_format, output_mode]
+        if self.backend.name != 'edge':
+            key_parts.append(self.backend.name)
+        if self.augmenter:
+            key_parts.append(self.augmenter.settings())
+        if self.turn_taking:
+            key_parts.append(self.turn_taking.settings())
+        conversation_key = content_hash(*key_parts)
+        record = self.manifest.get(conversation_key) if self.manifest else None
+        if record and record['status'] == 'done' and (
+            os.path.exists(record['result']['diarization_file'])
+            or (self.shard_writer and self.shard_writer.contains(file_id))
+        ):
+            self.metrics.inc('conversations_skipped_total')
+            if self.index:
+                await asyncio.get_running_loop().run_in_executor(
+                    self._get_index_executor(), self._backfill_index, file_id, conversation['scam_type'], audio_format, record
+                )
+            return dict(record['result'], skipped=True)
         
         # Create output directory for this conversation
-        conv_dir = os.path.join(output_dir, file_id)
         os.makedirs(conv_dir, exist_ok=True)
         
-        # Assign distinct voices
-        victim_voice, scammer_voice, victim_gender, scammer_gender = self.assign_voices(language)
+        if record:
+            # Retry with the voices and prosody of the earlier attempt, so its finished segments still match
+            voice_plan = record['voice_plan']
+        else:
+            rng = item_rng(self.seed, 'voices', file_id) if self.seed is not None else random
+            voice_plan = self.plan_voices(conversation, rng)
+            if self.turn_taking:
+                voice_plan['turns'] = self.turn_taking.plan(conversation['segments'], rng)
+            if self.augmenter:
+                voice_plan['augmentation'] = self.augmenter.plan(rng)
+            if self.manifest:
+                self.manifest.record(conversation_key, 'started', kind='conversation', file_id=file_id, voice_plan=voice_plan)
         
-        print(f"Generating audio for {file_id} in {language}")
+        victim_voice, scammer_voice = voice_plan['voices']['victim'], voice_plan['voices']['scammer']
+        victim_gender, scammer_gender = voice_plan['genders']['victim'], voice_plan['genders']['scammer']
         
-        audio_segments = []
-        diarization_data = []
+        turns = voice_plan.get('turns') or [None] * len(voice_plan['segments'])
+        segment_plan = []
+        for i, (segment, segment_voice, turn) in enumerate(zip(conversation['segments'], voice_plan['segments'], turns)):
+            segment_plan.append({
+                'file': os.path.join(conv_dir, f"segment_{i+1:03d}.{audio_format}"),
+                'segment': segment,
+                'voice': segment_voice['voice'],
+                'settings': segment_voice['settings'],
+                'pause': segment_voice['pause'],
+                'turn': turn
+            })
         
-        # Generate audio for each segment
-        current_time = 0.0
+        audio_file = None
+        timings = []
+        conversation_start = time.perf_counter()
         
-        for i, segment in enumerate(conversation['segments']):
-            segment_file = os.path.join(conv_dir, f"segment_{i+1:03d}.{audio_format}")
-            
-            # Assign voice based on role
-            if segment['role'] == 'victim':
-                voice = victim_voice
-                gender = victim_gender
-            else:  # scammer
-                voice = scammer_voice
-                gender = scammer_gender
+        if output_mode == "conversation":
+            audio_file = os.path.join(conv_dir, f"{file_id}.{audio_format}")
+            timings = await self.stream_conversation_audio(segment_plan, audio_file, audio_format)
+            # The conversation ends with the last segment's audio
+            total_duration = max((timing[1] for timing in timings if timing), default=0.0)
+            self.metrics.inc('segments_total', sum(1 for timing in timings if timing))
+            self.metrics.inc('audio_seconds_total', total_duration)
+            self.metrics.inc('bytes_written_total', os.path.getsize(audio_file))
+        else:
+            # Fan out segment synthesis, bounded per conversation (and globally by segment_semaphore)
+            conversation_semaphore = asyncio.Semaphore(self.max_segments_per_conversation)
             
-            # Get voice settings for this role
-            settings = self.get_voice_settings(segment['role'], gender)
+            async def synthesize(i, plan):
+                segment_key = content_hash(plan['file'], plan['segment']['text'], plan['voice'], plan['settings'], audio_format)
+                if self.augmenter:
+                    # Augmented segment files are rewritten in place, so they must not count as plain ones
+                    segment_key = content_hash(segment_key, self.augmenter.settings())
+                if self.manifest and self.manifest.is_done(segment_key) and os.path.exists(plan['file']):
+                    return self.manifest.get(segment_key)['duration']
+                
+                async with conversation_semaphore:
+                    duration = await self.generate_audio_segment(
+                        plan['segment']['text'],
+                        plan['voice'],
+                        plan['file'],
+                        rate=plan['settings']["rate"],
+                        volume=plan['settings']["volume"],
+                        pitch=plan['settings']["pitch"],
+                        audio_format=audio_format
+                    )
+                
+                if self.manifest:
+                    status = 'failed' if duration is None else 'done'
+                    self.manifest.record(segment_key, status, kind='segment', file=plan['file'], duration=duration)
+                return duration
             
-            print(f"  Generating segment {i+1}/{len(conversation['segments'])}: {segment['role']}")
+            results = await asyncio.gather(*(synthesize(i, plan) for i, plan in enumerate(segment_plan)))
             
-            success = await self.generate_audio_segment(
-                segment['text'], 
-                voice, 
-                segment_file,
-                rate=settings["rate"],
-                volume=settings["volume"],
-                pitch=settings["pitch"]
-            )
+            # Lay out the timeline in segment order; durations are measured from the synthesized audio itself
+            current_time = 0.0
+            for plan, segment_duration in zip(segment_plan, results):
+                if segment_duration is None:
+                    timings.append(None)
+                    continue
+                timings.append((current_time, current_time + segment_duration))
+                current_time += segment_duration + plan['pause']  # Variable pause between segments
+            total_duration = current_time
+        
+        # Telephony augmentation of the finished audio, as one batch; incomplete conversations are augmented on the retry
+        augmentation = voice_plan.get('augmentation')
+        if augmentation and None not in timings:
+            audio_files = [audio_file] if audio_file else [plan['file'] for plan in segment_plan]
+            with self.metrics.timer('augment_seconds'):
+                lost_packets = await asyncio.get_running_loop().run_in_executor(
+                    self._get_decode_pool(), augment_wav_files, audio_files, augmentation
+                )
+            augmentation = dict(augmentation, lost_packets=lost_packets)
+        
+        audio_segments = []
+        diarization_data = []
+        
+        for plan, timing in zip(segment_plan, timings):
+            segment = plan['segment']
             
-            if success:
-                # Get actual duration by checking file (rough estimation)
-                word_count = len(segment['text'].split())
-                segment_duration = max(1.5, word_count * 0.35)
-                
-                # Add some randomness to make it more natural
-                segment_duration *= random.uniform(0.9, 1.2)
-                
+            if timing is not None:
+                start, end = timing
                 audio_segments.append({
-                    'file': segment_file,
-                    'start': current_time,
-                    'end': current_time + segment_duration,
+                    'file': audio_file or plan['file'],
+                    'start': start,
+                    'end': end,
                     'speaker': segment['speaker'],
                     'role': segment['role'],
                     'text': segment['text'],
                 })
                 
                 diarization_data.append({
-                    'start': round(current_time, 2),
-                    'end': round(current_time + segment_duration, 2),
+                    'start': round(start, 3),
+                    'end': round(end, 3),
                     'speaker': segment['speaker'],
                     'role': segment['role'],
                     'text': segment['text'],
-                    'voice': voice
+                    'voice': plan['voice']
                 })
-                
-                current_time += segment_duration + random.uniform(0.3, 1.0)  # Variable pause between segments
+                if plan.get('interrupted'):
+                    # The audio stops before the end of the text
+                    diarization_data[-1]['interrupted'] = True
         
         # Save diarization JSON
         diarization_json = {
             "file_id": file_id,
-            "duration": round(current_time, 2),
+            "duration": round(total_duration, 3),
             "language": language,
             "scam_type": conversation['scam_type'],
             "voices": {
@@ -193,7 +635,15 @@ class AudioConversationGenerator:
             },
             "segments": diarization_data
         }
+        if self.turn_taking:
+            diarization_json["overlaps"] = [
+                dict(overlap, start=round(overlap['start'], 3), end=round(overlap['end'], 3))
+                for overlap in overlap_intervals(audio_segments)
+            ]
+        if augmentation:
+            diarization_json["augmentation"] = augmentation
         
+        labels_start = time.perf_counter()
         diarization_file = os.path.join(conv_dir, f"{file_id}_diarization.json")
         with open(diarization_file, 'w', encoding='utf-8') as f:
             json.dump(diarization_json, f, indent=2, ensure_ascii=False)
@@ -212,90 +662,275 @@ class AudioConversationGenerator:
                     segment['text'],
                     segment['voice']
                 ])
+        self.metrics.observe('file_write_seconds', time.perf_counter() - labels_start)
+        self.metrics.inc('bytes_written_total', os.path.getsize(diarization_file) + os.path.getsize(transcript_file))
         
-        return {
+        result = {
             'file_id': file_id,
             'audio_dir': conv_dir,
-            'duration_sec': round(current_time, 2),
+            'audio_file': audio_file,
+            'duration_sec': round(total_duration, 3),
             'num_segments': len(audio_segments),
             'diarization_file': diarization_file,
             'transcript_file': transcript_file,
             'victim_voice': victim_voice,
-            'scammer_voice': scammer_voice
+            'scammer_voice': scammer_voice,
+            'tts_engine': self.backend.description,
+            'recording_conditions': 'synthetic_tts_telephony' if augmentation else 'synthetic_tts'
         }
+        
+        # Conversations with missing segments stay failed, so a rerun redoes just those segments
+        status = 'done' if len(audio_segments) == len(segment_plan) else 'failed'
+        
+        self.metrics.observe('conversation_seconds', time.perf_counter() - conversation_start)
+        self.metrics.inc('conversations_synthesized_total' if status == 'done' else 'conversations_incomplete_total')
+        
+        def record_result(result):
+            if self.manifest:
+                self.manifest.record(
+                    conversation_key, status, kind='conversation', file_id=file_id,
+                    scam_type=conversation['scam_type'], language=language,
+                    voice_plan=voice_plan, result=result,
+                    metadata=build_metadata_row(result, audio_format)
+                )
+            if self.index and status == 'done':
+                return self._index_conversation(conversation['scam_type'], audio_format, voice_plan, diarization_json, result)
+        
+        if self.shard_writer and status == 'done':
+            # From here on the conversation lives in a shard: paths become shard members. The shard is only
+            # durable once it is complete, so the directory is removed and the conversation recorded as done
+            # in shard_finished; until then an interrupted run redoes it from its finished segments
+            self.pending_shard[file_id] = (conv_dir, lambda shard: record_result(sharded_result(result, self.shard_writer.shard_dir, shard)))
+            with self.metrics.timer('shard_write_seconds'):
+                shard = self.shard_writer.add_conversation_dir(file_id, conv_dir)
+            return sharded_result(result, self.shard_writer.shard_dir, shard)
+        
+        index_write = record_result(result)
+        if index_write:
+            await index_write
+        return result
+    
+    def shard_finished(self, shard_name, file_ids):
+        """ShardWriter callback: the conversations of a complete shard are done and their directories can go.
 
-async def main():
-    parser = argparse.ArgumentParser(description='Generate audio from scam conversations using Edge TTS')
-    parser.add_argument('--input-dir', required=True, help='Directory containing conversation JSON files')
+        Their index writes are queued on the index thread without waiting; close() waits for them.
+        """
+        for file_id in file_ids:
+            pending = self.pending_shard.pop(file_id, None)
+            if pending is None:
+                continue
+            conv_dir, record_result = pending
+            shutil.rmtree(conv_dir)
+            record_result(shard_name)
+
+def sharded_result(result, shard_dir, shard):
+    """Synthesis result with its paths pointing at the members of its tar shard"""
+    file_id = result['file_id']
+    return dict(
+        result,
+        audio_dir=os.path.join(shard_dir, shard),
+        audio_file=result['audio_file'] and sample_member_name(file_id, os.path.basename(result['audio_file'])),
+        diarization_file=sample_member_name(file_id, os.path.basename(result['diarization_file'])),
+        transcript_file=sample_member_name(file_id, os.path.basename(result['transcript_file']))
+    )
+
+def build_metadata_row(result, audio_format):
+    """Row of dataset_metadata.csv for a completed conversation"""
+    return {
+        'file_id': result['file_id'],
+        'filename': result['file_id'],
+        'duration_sec': result['duration_sec'],
+        'num_speakers': 2,
+        'speaker_roles': 'victim,scammer',
+        'source_type': 'simulated',
+        'recording_conditions': result.get('recording_conditions', 'synthetic_tts'),
+        'audio_format': audio_format,
+        'audio_directory': result['audio_dir'],
+        'diarization_file': result['diarization_file'],
+        'transcript_file': result['transcript_file'],
+        'victim_voice': result['victim_voice'],
+        'scammer_voice': result['scammer_voice'],
+        'notes': f"Generated using {result.get('tts_engine', 'Edge TTS')} with distinct voices"
+    }
+
+def write_dataset_metadata(metadata_file, manifest):
+    """Rewrite dataset_metadata.csv in ID order from every conversation the manifest knows is complete"""
+    dataset_metadata = sorted(
+        (record['metadata'] for record in manifest.done_records('conversation')),
+        key=lambda row: file_id_sort_key(row['file_id'])
+    )
+    with open(metadata_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=METADATA_FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(dataset_metadata)
+    return dataset_metadata
+
+def add_audio_arguments(parser):
+    """Command-line options for audio synthesis, shared by generate_audio.py and generate_dataset.py"""
     parser.add_argument('--output-dir', default='audio_dataset', help='Output directory for audio files')
     parser.add_argument('--audio-format', choices=['wav', 'mp3'], default='wav', help='Audio format')
+    parser.add_argument('--output-mode', choices=['segments', 'conversation'], default='segments',
+                        help='One audio file per segment, or a single streamed file per conversation')
+    parser.add_argument('--max-concurrent-conversations', type=int, default=4, help='Conversations processed at the same time')
+    parser.add_argument('--max-concurrent-segments', type=int, default=8, help='TTS requests in flight across all conversations')
+    parser.add_argument('--max-segments-per-conversation', type=int, default=4, help='TTS requests in flight within one conversation')
+    parser.add_argument('--decode-workers', type=int, default=None, help='Processes decoding MP3 to WAV and applying telephony augmentation (default: CPU count)')
+    parser.add_argument('--tts-cache-dir', default=None, help='Directory for the TTS result cache (default: no cache)')
+    parser.add_argument('--tts-cache-max-mb', type=float, default=1024, help='Size budget of the TTS cache in MB (default: 1024)')
+    parser.add_argument('--tts-backend', choices=['edge', 'local', 'stub'], default='edge',
+                        help='TTS backend: edge (Edge TTS), local (offline CPU synthesizer, WAV only) or stub (silent, for throughput tests)')
+    parser.add_argument('--tts-workers', type=int, default=None, help='Processes of the local TTS backend (default: CPU count)')
+    parser.add_argument('--stub-latency', type=float, default=0.2, help='Simulated round-trip latency of the stub backend (seconds)')
+    parser.add_argument('--stub-jitter', type=float, default=0.0, help='Random +/- variation of the stub latency (seconds)')
+    parser.add_argument('--stub-error-rate', type=float, default=0.0, help='Fraction of stub requests that fail')
+    parser.add_argument('--shard-dir', default=None, help='Pack finished conversations into tar shards here instead of keeping per-conversation directories')
+    parser.add_argument('--max-shard-mb', type=float, default=1024, help='Size at which a new shard is started, in MB (default: 1024)')
+    add_telephony_arguments(parser)
+    add_turn_taking_arguments(parser)
+
+def build_backend(parser, args):
+    """TTS backend selected by --tts-backend"""
+    if args.tts_backend == 'stub':
+        return StubBackend(functools.partial(
+            StubCommunicate, latency=args.stub_latency, jitter=args.stub_jitter, error_rate=args.stub_error_rate
+        ))
+    if args.tts_backend == 'local':
+        if args.audio_format == 'mp3':
+            parser.error("The local TTS backend produces PCM; use --audio-format wav")
+        return LocalBackend(workers=args.tts_workers)
+    return EdgeBackend()
+
+def build_audio_generator(parser, args):
+    """AudioConversationGenerator configured from the options of add_audio_arguments and add_partition_arguments"""
+    generator = AudioConversationGenerator(
+        backend=build_backend(parser, args),
+        max_concurrent_segments=args.max_concurrent_segments,
+        max_segments_per_conversation=args.max_segments_per_conversation,
+        decode_workers=args.decode_workers
+    )
+    
+    if args.tts_cache_dir and generator.pcm_output:
+        # The cache holds MP3 for linking into place; local PCM synthesis is cheap enough to redo
+        print(f"The {args.tts_backend} TTS backend produces PCM, not caching it")
+    elif args.tts_cache_dir:
+        generator.cache = TTSCache(args.tts_cache_dir, int(args.tts_cache_max_mb * 1e6))
+    
+    if args.telephony:
+        if args.audio_format != 'wav':
+            parser.error("--telephony works on PCM; use --audio-format wav")
+        generator.augmenter = TelephonyAugmenter(args.snr_db, args.max_packet_loss)
+    
+    if args.overlap_prob or args.interruption_prob:
+        if args.output_mode != 'conversation' or args.audio_format != 'wav':
+            parser.error("Overlapping speech is mixed into one file per conversation; use --output-mode conversation --audio-format wav")
+        generator.turn_taking = TurnTaking(args.overlap_prob, args.interruption_prob, args.max_overlap)
+    
+    generator.seed = args.seed
+    
+    if args.shard_dir:
+        generator.shard_writer = ShardWriter(args.shard_dir, int(args.max_shard_mb * 1e6), generator.shard_finished)
+    
+    return generator
+
+def audio_progress(metrics):
+    """Progress line fragment for the audio synthesis stage"""
+    return (f"audio {metrics.value('segments_total')} segments ({metrics.rate('segments_total'):.1f}/s), "
+            f"{metrics.value('audio_seconds_total') / 60:.1f} min ({metrics.rate('audio_seconds_total'):.1f}x real time) | "
+            f"tts p50 {metrics.percentile('tts_request_seconds', 50):.2f}s p95 {metrics.percentile('tts_request_seconds', 95):.2f}s, "
+            f"{metrics.value('tts_fallbacks_total')} fallbacks, {metrics.value('tts_errors_total')} errors | "
+            f"{metrics.value('bytes_written_total') / 1e6:.1f} MB written")
+
+async def main():
+    parser = argparse.ArgumentParser(description='Generate audio from scam conversations using text-to-speech')
+    parser.add_argument('--input-dir', required=True, help='Directory containing conversation JSON files')
+    add_audio_arguments(parser)
+    add_partition_arguments(parser)
+    add_metrics_arguments(parser)
     
     args = parser.parse_args()
+    resolve_partition_arguments(parser, args)
     
-    generator = AudioConversationGenerator()
+    generator = build_audio_generator(parser, args)
     
     # Create output directory
     os.makedirs(args.output_dir, exist_ok=True)
     
+    # Progress of earlier runs into the same output directory
+    generator.manifest = Manifest(os.path.join(args.output_dir, 'manifest.jsonl'))
+    generator.index = DatasetIndex(os.path.join(args.output_dir, INDEX_FILENAME))
+    
+    # Metadata rows are appended as conversations complete, so a crash loses nothing
+    metadata_file = os.path.join(args.output_dir, 'dataset_metadata.csv')
+    write_header = not os.path.exists(metadata_file) or os.path.getsize(metadata_file) == 0
+    metadata_f = open(metadata_file, 'a', newline='', encoding='utf-8')
+    metadata_writer = csv.DictWriter(metadata_f, fieldnames=METADATA_FIELDNAMES)
+    if write_header:
+        metadata_writer.writeheader()
+    
     # Find all conversation JSON files
     conversation_files = [f for f in os.listdir(args.input_dir) if f.endswith('.json')]
-    conversation_files.sort()  # Process in sorted order
+    conversation_files.sort(key=lambda f: file_id_sort_key(os.path.splitext(f)[0]))  # Process in ID order
+    
+    # Only this shard's conversations; a shard's text and audio stages own the same IDs
+    conversation_files = [f for f in conversation_files if owns(os.path.splitext(f)[0], args.shard_index, args.num_shards)]
     
     print(f"Found {len(conversation_files)} conversation files")
     print("Processing conversations...")
     
-    dataset_metadata = []
-    
-    # Process conversations ONE BY ONE (sequentially)
-    for i, conv_file in enumerate(conversation_files, 1):
-        print(f"\n[{i}/{len(conversation_files)}] Processing: {conv_file}")
-        
-        input_path = os.path.join(args.input_dir, conv_file)
-        
-        result = await generator.generate_conversation_audio(
-            input_path, 
-            args.output_dir, 
-            args.audio_format
-        )
-        
-        if result:
-            dataset_metadata.append({
-                'file_id': result['file_id'],
-                'filename': result['file_id'],
-                'duration_sec': result['duration_sec'],
-                'num_speakers': 2,
-                'speaker_roles': 'victim,scammer',
-                'source_type': 'simulated',
-                'recording_conditions': 'synthetic_tts',
-                'audio_format': args.audio_format,
-                'audio_directory': result['audio_dir'],
-                'diarization_file': result['diarization_file'],
-                'transcript_file': result['transcript_file'],
-                'victim_voice': result['victim_voice'],
-                'scammer_voice': result['scammer_voice'],
-                'notes': 'Generated using Edge TTS with distinct voices'
-            })
+    # Process several conversations at once; their segments share the global TTS limit
+    conversation_semaphore = asyncio.Semaphore(args.max_concurrent_conversations)
+    start_time = time.monotonic()
+    
+    # One live status line instead of a line per segment
+    metrics = generator.metrics
+    progress = ProgressReporter(
+        lambda: (f"[{metrics.elapsed():6.1f}s] "
+                 f"{metrics.value('conversations_synthesized_total') + metrics.value('conversations_skipped_total')}/{len(conversation_files)} "
+                 f"conversations | {audio_progress(metrics)}"),
+        interval=args.progress_interval, metrics=metrics, metrics_file=args.metrics_file
+    ).start()
+    
+    async def process(i, conv_file):
+        async with conversation_semaphore:
+            input_path = os.path.join(args.input_dir, conv_file)
             
-            print(f"✅ Completed: {result['file_id']} ({result['duration_sec']} seconds)")
-        else:
-            print(f"❌ Failed: {conv_file}")
+            result = await generator.generate_conversation_audio(
+                input_path, 
+                args.output_dir, 
+                args.audio_format,
+                args.output_mode
+            )
+            
+            if result and not result.get('skipped'):
+                metadata_writer.writerow(build_metadata_row(result, args.audio_format))
+                metadata_f.flush()
+            elif not result:
+                print(f"❌ Failed: {conv_file}")
+            return result
     
-    # Save dataset metadata
-    metadata_file = os.path.join(args.output_dir, 'dataset_metadata.csv')
-    with open(metadata_file, 'w', newline='', encoding='utf-8') as f:
-        fieldnames = [
-            'file_id', 'filename', 'duration_sec', 'num_speakers', 'speaker_roles',
-            'source_type', 'recording_conditions', 'audio_format', 'audio_directory',
-            'diarization_file', 'transcript_file', 'victim_voice', 'scammer_voice', 'notes'
-        ]
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(dataset_metadata)
+    try:
+        results = await asyncio.gather(*(process(i, conv_file) for i, conv_file in enumerate(conversation_files, 1)))
+    finally:
+        generator.close()
+        metadata_f.close()
+        progress.stop()
+    elapsed = time.monotonic() - start_time
+    
+    total_segments = sum(result['num_segments'] for result in results if result and not result.get('skipped'))
+    
+    dataset_metadata = write_dataset_metadata(metadata_file, generator.manifest)
+    generator.manifest.close()
+    generator.index.close()
     
     print(f"\nAudio generation completed!")
     print(f"Dataset metadata saved: {metadata_file}")
     print(f"Total conversations processed: {len(dataset_metadata)}")
     print(f"Output directory: {args.output_dir}")
+    print(f"Elapsed: {elapsed:.1f}s ({total_segments / max(elapsed, 1e-9):.1f} segments/sec)")
+    if generator.cache:
+        print(generator.cache.summary())
+    if args.metrics_file:
+        print(f"Metrics saved: {args.metrics_file}")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -2,15 +2,109 @@
 import json
 import csv
 import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from google import genai
-from google.genai import types
+from google.genai import errors, types
 import os
 from datetime import datetime
 import argparse
 
+from manifest import Manifest
+from metrics import Metrics, ProgressReporter, add_metrics_arguments
+from partition import add_partition_arguments, file_id_sort_key, owns, resolve_partition_arguments
+from quota_planner import QuotaPlanner, load_quotas
+from prompt_templates import PromptTemplates
+from response_parser import DialogueParser
+from stubs import FakeGenaiClient
+
+METADATA_FIELDNAMES = ['file_id', 'filename', 'scam_type', 'language', 'num_speakers', 'speaker_roles', 'timestamp']
+
+# Structured output requested in batch mode: one object per conversation in the prompt
+BATCH_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "conversation_index": {"type": "INTEGER"},
+            "turns": {
+                "type": "ARRAY",
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "speaker": {"type": "STRING", "enum": ["VICTIM", "SCAMMER"]},
+                        "text": {"type": "STRING"}
+                    },
+                    "required": ["speaker", "text"]
+                }
+            }
+        },
+        "required": ["conversation_index", "turns"]
+    }
+}
+
+# HTTP status codes worth retrying with backoff (quota exhausted / model overloaded)
+RETRYABLE_STATUS_CODES = (429, 503)
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `per_minute` units per minute"""
+    
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+    
+    def acquire(self, amount=1):
+        """Block until `amount` units are available, then take them"""
+        # Never ask for more than the bucket can hold, or we would wait forever
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+    
+    def adjust(self, amount):
+        """Charge (or refund, if negative) units after the fact; the bucket may go into debt"""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+
 class ScamConversationGenerator:
-    def __init__(self, api_key):
-        self.client = genai.Client(api_key=api_key)
+    def __init__(self, api_key=None, client=None, rpm=None, tpm=None, max_retries=5, backoff_base=2.0, metrics=None):
+        self.client = client or genai.Client(api_key=api_key)
+        
+        # Request latency, retries and token usage (metrics.Metrics)
+        self.metrics = metrics or Metrics()
+        
+        # Optional client-side rate limits, shared by all worker threads
+        self.request_bucket = TokenBucket(rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_output_tokens = 2000
+        self.max_batch_output_tokens = 8192
+        
+        # Validates responses before they reach audio synthesis; conversations shorter than min_turns are rejected
+        self.min_turns = 8
+        self.parser = DialogueParser(min_turns=self.min_turns)
+        
+        # Request / conversation counters, shared by all worker threads
+        self.stats_lock = threading.Lock()
+        self.num_requests = 0
+        self.num_conversations = 0
+        
         self.scam_types = [
             "bank_fraud",
             "tech_support",
@@ -26,132 +120,163 @@ class ScamConversationGenerator:
             "english": "Generate conversation in English only"
         }
         
+        # Loaded and compiled once; fails fast if any scam type / language pair lacks a prompt
+        self.prompts = PromptTemplates(self.languages)
+        self.prompts.check_coverage(self.scam_types, self.languages)
+        
     def generate_conversation(self, scam_type, language, conversation_id):
         """Generate a scam conversation using Gemini API"""
         
         prompt = self._build_prompt(scam_type, language)
         
         try:
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash-exp",
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=0.9,
-                    max_output_tokens=2000,
-                )
-            )
+            response = self._generate_with_backoff(prompt)
             
-            return self._parse_response(response.text, conversation_id, scam_type, language)
+            conversation = self._parse_response(response.text, conversation_id, scam_type, language)
+            if conversation:
+                self._count_conversation()
+            else:
+                self.metrics.inc('conversations_rejected_total')
+            return conversation
             
         except Exception as e:
             print(f"Error generating conversation: {e}")
+            self.metrics.inc('conversations_failed_total')
             return None
     
+    def generate_conversation_batch(self, jobs):
+        """Generate several conversations with a single Gemini request.
+        
+        `jobs` is a list of (scam_type, language, conversation_id). Returns one conversation (or None)
+        per job, in order; items missing or invalid in the batch response are re-requested individually.
+        """
+        prompt = self.prompts.render_batch([(scam_type, language) for scam_type, language, _ in jobs])
+        
+        conversations = [None] * len(jobs)
+        try:
+            response = self._generate_with_backoff(
+                prompt,
+                max_output_tokens=min(self.max_output_tokens * len(jobs), self.max_batch_output_tokens),
+                response_mime_type="application/json",
+                response_schema=BATCH_RESPONSE_SCHEMA
+            )
+            try:
+                items = json.loads(response.text)
+            except json.JSONDecodeError:
+                # Output cut off at the token limit still holds every item completed before the cut
+                items = complete_array_items(response.text)
+                self.metrics.inc('batch_responses_truncated_total')
+        except Exception as e:
+            print(f"Error generating batch of {len(jobs)} conversations: {e}")
+            items = []
+        
+        # Split the batch into individual conversations, keeping only valid items for known indices
+        for item in items if isinstance(items, list) else []:
+            try:
+                index = int(item['conversation_index']) - 1
+                if not 0 <= index < len(jobs) or conversations[index] is not None:
+                    continue
+                segments = self._segments_from_turns(item['turns'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            
+            if segments is not None:
+                scam_type, language, conversation_id = jobs[index]
+                conversations[index] = self._build_conversation(segments, conversation_id, scam_type, language)
+                self._count_conversation()
+        
+        for index, (scam_type, language, conversation_id) in enumerate(jobs):
+            if conversations[index] is None:
+                print(f"Batch item {conversation_id} missing or invalid, re-requesting it on its own")
+                self.metrics.inc('batch_items_rerequested_total')
+                conversations[index] = self.generate_conversation(scam_type, language, conversation_id)
+        
+        return conversations
+    
+    def _segments_from_turns(self, turns):
+        """Validate structured turns from a batch response; returns segments, or None if unusable"""
+        segments, reasons = self.parser.validate_turns([(str(turn['speaker']), str(turn['text'])) for turn in turns])
+        if reasons:
+            return None
+        return segments
+    
+    def _count_conversation(self):
+        with self.stats_lock:
+            self.num_conversations += 1
+        self.metrics.inc('conversations_generated_total')
+    
+    def max_batch_size(self):
+        """Most conversations whose full output fits the output token limit of one batch request"""
+        return max(1, self.max_batch_output_tokens // self.max_output_tokens)
+    
+    def conversations_per_request(self):
+        with self.stats_lock:
+            return self.num_conversations / self.num_requests if self.num_requests else 0.0
+    
+    def _generate_with_backoff(self, prompt, max_output_tokens=None, **config):
+        """Call Gemini under the rate limits, retrying quota errors with exponential backoff"""
+        max_output_tokens = max_output_tokens or self.max_output_tokens
+        
+        # Rough token estimate (~4 characters per token) until the real usage is known
+        estimated_tokens = len(prompt) // 4 + max_output_tokens
+        
+        for attempt in range(self.max_retries + 1):
+            with self.metrics.timer('rate_limit_wait_seconds'):
+                if self.request_bucket:
+                    self.request_bucket.acquire()
+                if self.token_bucket:
+                    self.token_bucket.acquire(estimated_tokens)
+            
+            with self.stats_lock:
+                self.num_requests += 1
+            self.metrics.inc('gemini_requests_total')
+            
+            try:
+                with self.metrics.timer('gemini_request_seconds'):
+                    response = self.client.models.generate_content(
+                        model="gemini-2.0-flash-exp",
+                        contents=prompt,
+                        config=types.GenerateContentConfig(
+                            temperature=0.9,
+                            max_output_tokens=max_output_tokens,
+                            **config
+                        )
+                    )
+            except errors.APIError as e:
+                self.metrics.inc('gemini_errors_total')
+                if e.code not in RETRYABLE_STATUS_CODES or attempt == self.max_retries:
+                    raise
+                delay = min(60.0, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+                print(f"Quota error ({e.code}), retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+                self.metrics.inc('gemini_retries_total')
+                self.metrics.inc('gemini_backoff_seconds_total', delay)
+                time.sleep(delay)
+                continue
+            
+            # Settle the token bucket against what the request actually used
+            usage = getattr(response, 'usage_metadata', None)
+            if usage and usage.total_token_count:
+                self.metrics.inc('gemini_tokens_total', usage.total_token_count)
+            if self.token_bucket and usage and usage.total_token_count:
+                self.token_bucket.adjust(usage.total_token_count - estimated_tokens)
+            
+            return response
+    
     def _build_prompt(self, scam_type, language):
         """Build the prompt for Gemini"""
-
-        base_prompts = {
-                "bank_fraud": {
-                "english": """Generate a realistic and natural phone conversation between a bank fraud scammer and a victim. 
-        The scammer pretends to be from the victim's bank security department, claiming there’s suspicious activity on their account.
-
-        SCAMMER: (professional, persuasive, urgent; may ask for OTP/account details)
-        VICTIM: (initially cautious; may become convinced or remain skeptical)
-
-        Requirements:
-        - Use only spoken dialogue lines. Do NOT include stage directions, sound descriptions, or action descriptions inside the dialogue (for example: do not use *rustling sounds*, (reading out the card number slowly), [sigh], or any bracketed/asterisked actions).
-        - Short natural hesitations like "um", "uh", "…", and short pauses written as ellipses are allowed inside spoken lines.
-        - Speaker labels must always be the labels VICTIM and SCAMMER (do NOT label speakers by any provided name).
-        - If either person introduces their own name in speech (e.g., "This is Rahul from the bank" or "I'm Mr. Mehta"), then those names may be used naturally inside later spoken lines (e.g., "Mr. Mehta, could you confirm..."). Do NOT replace the line label with those names — lines must still start with VICTIM: or SCAMMER:.
-        - Alternate speakers line-by-line. Include at least 8–10 exchanges.
-        - End the conversation naturally (victim realizes it's a scam, refuses, gives info, hangs up upset, etc.). Do not end abruptly or with instructions.""",
-
-                    "hindi": """बैंक धोखाधड़ी स्कैमर और पीड़ित के बीच एक वास्तविक फोन वार्तालाप उत्पन्न करें। 
-        स्कैमर बैंक सुरक्षा विभाग होने का दावा करता है और कहता है कि खाते में संदिग्ध गतिविधि है।
-
-        नियम:
-        - केवल बोली हुई संवाद पंक्तियाँ लिखें। संवाद में स्टेज डायरेक्शन, आवाज़ के वर्णन या क्रियाओं का वर्णन न डालें (उदाहरण: *rustling sounds*, (reading out the card number slowly), [sigh] इत्यादि न लिखें)।
-        - "um", "uh", "..." जैसी संक्षिप्त हिचकियाँ या विराम स्वीकार्य हैं।
-        - स्पीकर लेबल हमेशा VICTIM और SCAMMER रहें; नामों से लाइन लेबल मत बदलें।
-        - यदि कोई स्पीकर अपने नाम का परिचय देता है, तो वह नाम बाद की बोली में प्राकृतिक रूप से उपयोग किया जा सकता है पर लाइन की शुरुआत VICTIM: या SCAMMER: ही होनी चाहिए।
-        - स्पीकर्स बारी-बारी बोलें, कम से कम 8–10 विनिमय शामिल करें।
-        - बातचीत का अंत स्वाभाविक रूप से करें।""",
-
-                    "hinglish": """Generate a realistic Hinglish phone conversation between a bank fraud scammer and a victim.
-
-        Rules:
-        - Include only spoken dialogue lines. Do NOT include stage directions or sound/action descriptions like *rustling sounds* or (reading out the card number slowly).
-        - Short spoken hesitations ("um", "uh", "…") are allowed.
-        - Always label lines with VICTIM: and SCAMMER: only.
-        - If a name is spoken by a character, that name can be used naturally later inside speech, but do NOT replace the line label with that name.
-        - Alternate speakers line-by-line and produce at least 8–10 exchanges.
-        - End naturally (victim refuses, realises, or call ends emotionally)."""
-                },
-
-                "tech_support": {
-                    "english": """Generate a tech support scam conversation where the scammer claims the victim's computer has a virus.
-
-        Rules:
-        - Only spoken dialogue lines. Forbid stage directions, sound cues, or action descriptions in parentheses or asterisks.
-        - Short hesitations allowed ("um", "uh", "...").
-        - Labels must remain VICTIM: and SCAMMER:.
-        - If names are spoken, reuse them inside dialogue (do not use them as labels).
-        - Alternate lines and end naturally (refusal, agreement, or hang up).""",
-
-                    "hindi": """... (same rules as above in Hindi)""",
-
-                    "hinglish": """... (same rules as above in Hinglish)"""
-                }
-            }
-
-        language_instruction = self.languages.get(language, "")
-        scam_prompt = base_prompts.get(scam_type, {}).get(language, base_prompts["bank_fraud"]["english"])
-
-        return f"""{language_instruction}
-
-    {scam_prompt}
-
-    FORMAT (follow exactly):
-    VICTIM: [spoken dialogue — no stage directions or sound descriptions]
-    SCAMMER: [spoken dialogue — no stage directions or sound descriptions]
-    VICTIM: ...
-    SCAMMER: ...
-
-    Ensure strict alternation, natural flow, allowed brief hesitations (um, uh, ...), and a natural, complete ending."""
+        return self.prompts.render(scam_type, language)
 
     def _parse_response(self, response_text, conversation_id, scam_type, language):
-        """Parse the Gemini response into structured format"""
-        
-        lines = response_text.strip().split('\n')
-        segments = []
-        current_speaker = None
-        current_text = []
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('VICTIM:') or line.startswith('SCAMMER:'):
-                # Save previous segment
-                if current_speaker and current_text:
-                    segments.append({
-                        'speaker': current_speaker,
-                        'role': 'victim' if current_speaker == 'VICTIM' else 'scammer',
-                        'text': ' '.join(current_text)
-                    })
-                
-                # Start new segment
-                current_speaker = 'VICTIM' if line.startswith('VICTIM:') else 'SCAMMER'
-                current_text = [line.split(':', 1)[1].strip()]
-            elif current_speaker and line:
-                current_text.append(line)
-        
-        # Add the last segment
-        if current_speaker and current_text:
-            segments.append({
-                'speaker': current_speaker,
-                'role': 'victim' if current_speaker == 'VICTIM' else 'scammer',
-                'text': ' '.join(current_text)
-            })
+        """Parse the Gemini response into structured format; returns None if it fails validation"""
+        segments, reasons = self.parser.parse(response_text)
+        if reasons:
+            print(f"Rejected {conversation_id}: {', '.join(reasons)}")
+            return None
         
+        return self._build_conversation(segments, conversation_id, scam_type, language)
+    
+    def _build_conversation(self, segments, conversation_id, scam_type, language):
+        """Conversation record saved as generated_conversations/<conversation_id>.json"""
         return {
             'file_id': conversation_id,
             'scam_type': scam_type,
@@ -162,60 +287,207 @@ class ScamConversationGenerator:
             'timestamp': datetime.now().isoformat()
         }
 
+def add_generation_arguments(parser):
+    """Command-line options for conversation generation, shared by generate_conversations.py and generate_dataset.py"""
+    parser.add_argument('--api-key', help='Google AI Studio API key')
+    parser.add_argument('--num-conversations', type=int, default=5, help='Number of conversations to generate')
+    parser.add_argument('--quota-file', default=None, help='JSON of exact target counts per "scam_type/language" (overrides --num-conversations)')
+    parser.add_argument('--workers', type=int, default=1, help='Number of concurrent Gemini requests')
+    parser.add_argument('--batch-size', type=int, default=1, help='Conversations requested per Gemini call (structured JSON output)')
+    parser.add_argument('--rpm', type=float, default=None, help='Requests per minute limit (default: unlimited)')
+    parser.add_argument('--tpm', type=float, default=None, help='Tokens per minute limit (default: unlimited)')
+    parser.add_argument('--max-retries', type=int, default=5, help='Retries per conversation on quota errors')
+    parser.add_argument('--fake-client', action='store_true', help='Use an offline fake Gemini client (for throughput tests)')
+    parser.add_argument('--fake-latency', type=float, default=0.5, help='Simulated latency of the fake client (seconds)')
+    parser.add_argument('--fake-jitter', type=float, default=0.1, help='Random +/- variation of the fake client latency (seconds)')
+    parser.add_argument('--fake-error-rate', type=float, default=0.0, help='Fraction of fake requests that fail with 429')
+
+def build_conversation_generator(parser, args):
+    """ScamConversationGenerator configured from the options of add_generation_arguments"""
+    if not args.api_key and not args.fake_client:
+        parser.error('--api-key is required (or use --fake-client)')
+    
+    client = None
+    if args.fake_client:
+        client = FakeGenaiClient(latency=args.fake_latency, jitter=args.fake_jitter, error_rate=args.fake_error_rate)
+    
+    generator = ScamConversationGenerator(
+        args.api_key,
+        client=client,
+        rpm=args.rpm,
+        tpm=args.tpm,
+        max_retries=args.max_retries
+    )
+    
+    # Larger batches would be cut off at the output token limit, losing the conversations at the end
+    if args.batch_size > generator.max_batch_size():
+        print(f"--batch-size {args.batch_size} exceeds the output token limit of one request, using {generator.max_batch_size()}")
+        args.batch_size = generator.max_batch_size()
+    
+    return generator
+
+def complete_array_items(text):
+    """Items of a JSON array that was cut off part-way, up to the last complete one"""
+    decoder = json.JSONDecoder()
+    items = []
+    position = text.find('[') + 1
+    if not position:
+        return items
+    while True:
+        while position < len(text) and text[position] in ', \t\r\n':
+            position += 1
+        try:
+            item, position = decoder.raw_decode(text, position)
+        except json.JSONDecodeError:
+            return items
+        items.append(item)
+
+def build_planner(parser, generator, args):
+    """QuotaPlanner over the generator's scam types and languages, with the targets of --quota-file if given"""
+    quotas = load_quotas(args.quota_file) if args.quota_file else None
+    try:
+        planner = QuotaPlanner(generator.scam_types, generator.languages.keys(), quotas)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if quotas:
+        args.num_conversations = sum(planner.targets(0).values())
+        print(f"Quotas from {args.quota_file}: {args.num_conversations} conversations")
+    return planner
+
+def plan_jobs(planner, num_conversations, seed, shard_index=0, num_shards=1):
+    """(conversation_id, scam_type, language, voice_slot) for this shard's share of the run's plan"""
+    # Every shard plans the whole run, so the split does not change what any conversation gets
+    return [job for job in planner.plan(num_conversations, seed) if owns(job[0], shard_index, num_shards)]
+
+def text_progress(metrics):
+    """Progress line fragment for the text generation stage"""
+    return (f"text {metrics.value('conversations_generated_total')} ({metrics.rate('conversations_generated_total'):.2f}/s) | "
+            f"gemini p50 {metrics.percentile('gemini_request_seconds', 50):.2f}s p95 {metrics.percentile('gemini_request_seconds', 95):.2f}s | "
+            f"{metrics.value('gemini_requests_total')} requests, {metrics.value('gemini_retries_total')} retries, "
+            f"{metrics.value('gemini_tokens_total')} tokens | "
+            f"{metrics.value('conversations_rejected_total') + metrics.value('conversations_failed_total')} rejected/failed")
+
 def main():
     parser = argparse.ArgumentParser(description='Generate scam conversations using Google Gemini API')
-    parser.add_argument('--api-key', required=True, help='Google AI Studio API key')
-    parser.add_argument('--num-conversations', type=int, default=5, help='Number of conversations to generate')
     parser.add_argument('--output-dir', default='generated_conversations', help='Output directory')
+    add_generation_arguments(parser)
+    add_partition_arguments(parser)
+    add_metrics_arguments(parser)
     
     args = parser.parse_args()
+    resolve_partition_arguments(parser, args)
     
     # Create output directory
     os.makedirs(args.output_dir, exist_ok=True)
     
-    generator = ScamConversationGenerator(args.api_key)
+    generator = build_conversation_generator(parser, args)
+    planner = build_planner(parser, generator, args)
     
-    conversations_metadata = []
+    # Progress of earlier runs into the same output directory
+    manifest = Manifest(os.path.join(args.output_dir, 'manifest.jsonl'))
     
-    for i in range(args.num_conversations):
-        # Randomly select scam type and language
-        scam_type = random.choice(generator.scam_types)
-        language = random.choice(list(generator.languages.keys()))
-        
-        conversation_id = f"conv_{i+1:03d}"
-        print(f"Generating conversation {i+1}/{args.num_conversations}: {scam_type} in {language}")
-        
-        conversation = generator.generate_conversation(scam_type, language, conversation_id)
+    # Scam type, language and voice slot for each of this shard's conversations, planned up front;
+    # conversations already on disk count towards their cell, and only the shortfall is generated
+    planned = plan_jobs(planner, args.num_conversations, args.seed, args.shard_index, args.num_shards)
+    done = {
+        record['file_id']: (record['scam_type'], record['language'])
+        for record in manifest.done_records('conversation')
+        if os.path.exists(os.path.join(args.output_dir, record['filename']))
+    }
+    jobs = planner.replan(planned, done)
+    
+    if len(jobs) < len(planned):
+        print(f"Resuming: {len(planned) - len(jobs)} conversations already completed by earlier runs")
+    
+    # Metadata rows are appended as conversations complete, so a crash loses nothing
+    metadata_file = os.path.join(args.output_dir, 'metadata.csv')
+    write_header = not os.path.exists(metadata_file) or os.path.getsize(metadata_file) == 0
+    num_generated = 0
+    start_time = time.monotonic()
+    
+    # One live status line instead of a line per request
+    progress = ProgressReporter(
+        lambda: f"[{generator.metrics.elapsed():6.1f}s] {num_generated}/{len(jobs)} saved | {text_progress(generator.metrics)}",
+        interval=args.progress_interval, metrics=generator.metrics, metrics_file=args.metrics_file
+    ).start()
+    
+    with ThreadPoolExecutor(max_workers=args.workers) as executor, \
+            open(metadata_file, 'a', newline='', encoding='utf-8') as metadata_f:
+        metadata_writer = csv.DictWriter(metadata_f, fieldnames=METADATA_FIELDNAMES)
+        if write_header:
+            metadata_writer.writeheader()
         
-        if conversation:
-            # Save individual conversation JSON
-            output_file = os.path.join(args.output_dir, f"{conversation_id}.json")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(conversation, f, indent=2, ensure_ascii=False)
-            
-            # Add to metadata
-            conversations_metadata.append({
-                'file_id': conversation_id,
-                'filename': f"{conversation_id}.json",
-                'scam_type': scam_type,
-                'language': language,
-                'num_speakers': 2,
-                'speaker_roles': 'victim,scammer',
-                'timestamp': conversation['timestamp']
-            })
+        # One future per request: a single conversation, or a batch of them
+        batches = [jobs[i:i + args.batch_size] for i in range(0, len(jobs), args.batch_size)]
+        futures = {}
+        for batch in batches:
+            for conversation_id, scam_type, language, voice_slot in batch:
+                manifest.record(conversation_id, 'pending', kind='conversation', scam_type=scam_type, language=language)
             
-            print(f"Saved: {output_file}")
+            if len(batch) == 1:
+                future = executor.submit(lambda job: [generator.generate_conversation(job[1], job[2], job[0])], batch[0])
+            else:
+                future = executor.submit(
+                    generator.generate_conversation_batch,
+                    [(scam_type, language, conversation_id) for conversation_id, scam_type, language, _ in batch]
+                )
+            futures[future] = batch
+        
+        for future in as_completed(futures):
+            for (conversation_id, scam_type, language, voice_slot), conversation in zip(futures[future], future.result()):
+                if not conversation:
+                    manifest.record(conversation_id, 'failed', kind='conversation', scam_type=scam_type, language=language)
+                    continue
+                
+                # The audio stage maps the slot onto one of the language's voice pairs
+                conversation['voice_slot'] = voice_slot
+                
+                # Save individual conversation JSON
+                output_file = os.path.join(args.output_dir, f"{conversation_id}.json")
+                with generator.metrics.timer('file_write_seconds'):
+                    with open(output_file, 'w', encoding='utf-8') as f:
+                        json.dump(conversation, f, indent=2, ensure_ascii=False)
+                generator.metrics.inc('bytes_written_total', os.path.getsize(output_file))
+                
+                # Add to metadata
+                row = {
+                    'file_id': conversation_id,
+                    'filename': f"{conversation_id}.json",
+                    'scam_type': scam_type,
+                    'language': language,
+                    'num_speakers': 2,
+                    'speaker_roles': 'victim,scammer',
+                    'timestamp': conversation['timestamp']
+                }
+                metadata_writer.writerow(row)
+                metadata_f.flush()
+                manifest.record(conversation_id, 'done', kind='conversation', **row)
+                num_generated += 1
+    
+    progress.stop()
+    elapsed = time.monotonic() - start_time
+    
+    # Rewrite the metadata CSV in ID order from everything the manifest knows is complete
+    conversations_metadata = sorted(
+        ({field: record[field] for field in METADATA_FIELDNAMES} for record in manifest.done_records('conversation')),
+        key=lambda row: file_id_sort_key(row['file_id'])
+    )
+    manifest.close()
     
-    # Save metadata CSV
-    metadata_file = os.path.join(args.output_dir, 'metadata.csv')
     with open(metadata_file, 'w', newline='', encoding='utf-8') as f:
-        fieldnames = ['file_id', 'filename', 'scam_type', 'language', 'num_speakers', 'speaker_roles', 'timestamp']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer = csv.DictWriter(f, fieldnames=METADATA_FIELDNAMES)
         writer.writeheader()
         writer.writerows(conversations_metadata)
     
-    print(f"\nGenerated {args.num_conversations} conversations in '{args.output_dir}'")
+    print(f"\nGenerated {num_generated}/{len(jobs)} conversations in '{args.output_dir}' ({len(conversations_metadata)} in total)")
     print(f"Metadata saved: {metadata_file}")
+    print(f"Elapsed: {elapsed:.1f}s ({num_generated / max(elapsed, 1e-9):.2f} conversations/sec)")
+    print(f"Requests: {generator.num_requests} ({generator.conversations_per_request():.2f} conversations/request)")
+    print(generator.parser.summary())
+    print(planner.coverage(planned, {row['file_id']: (row['scam_type'], row['language']) for row in conversations_metadata}))
+    if args.metrics_file:
+        print(f"Metrics saved: {args.metrics_file}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
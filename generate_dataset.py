@@ -0,0 +1,189 @@
+# generate_dataset.py
+# Single-process pipeline: Gemini conversations stream straight into Edge TTS through a bounded queue
+import argparse
+import asyncio
+import csv
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from generate_audio import (
+    METADATA_FIELDNAMES, add_audio_arguments, audio_progress, build_audio_generator,
+    build_metadata_row, write_dataset_metadata
+)
+from generate_conversations import add_generation_arguments, build_conversation_generator, build_planner, plan_jobs, text_progress
+from dataset_index import INDEX_FILENAME, DatasetIndex
+from manifest import Manifest
+from metrics import ProgressReporter, add_metrics_arguments
+from partition import add_partition_arguments, resolve_partition_arguments
+
+
+class PipelineStats:
+    """Per-stage counters and queue depth samples for the streaming pipeline"""
+
+    def __init__(self, queue_size):
+        self.queue_size = queue_size
+        self.start_time = time.monotonic()
+        self.generated = 0
+        self.generation_failed = 0
+        self.synthesized = 0
+        self.synthesis_failed = 0
+        self.segments = 0
+        self.queue_samples = 0
+        self.queue_depth_sum = 0
+        self.queue_depth_max = 0
+
+    def sample_queue(self, depth):
+        self.queue_samples += 1
+        self.queue_depth_sum += depth
+        self.queue_depth_max = max(self.queue_depth_max, depth)
+
+    def elapsed(self):
+        return time.monotonic() - self.start_time
+
+    def summary(self):
+        elapsed = max(self.elapsed(), 1e-9)
+        mean_depth = self.queue_depth_sum / self.queue_samples if self.queue_samples else 0.0
+        return "\n".join([
+            f"Text stage:  {self.generated} conversations ({self.generated / elapsed:.2f}/s), {self.generation_failed} failed",
+            f"Audio stage: {self.synthesized} conversations ({self.synthesized / elapsed:.2f}/s), "
+            f"{self.segments} segments ({self.segments / elapsed:.1f}/s), {self.synthesis_failed} failed",
+            f"Queue depth: mean {mean_depth:.1f}, max {self.queue_depth_max} of {self.queue_size}",
+            f"Elapsed: {elapsed:.1f}s"
+        ])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Generate scam conversations and their audio in one streaming pipeline')
+    add_generation_arguments(parser)
+    add_audio_arguments(parser)
+    parser.add_argument('--queue-size', type=int, default=8, help='Parsed conversations waiting for TTS before generation pauses')
+    add_partition_arguments(parser)
+    add_metrics_arguments(parser)
+
+    args = parser.parse_args()
+    resolve_partition_arguments(parser, args)
+
+    text_generator = build_conversation_generator(parser, args)
+    planner = build_planner(parser, text_generator, args)
+    audio_generator = build_audio_generator(parser, args)
+    # Both stages report into one set of metrics
+    audio_generator.metrics = metrics = text_generator.metrics
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    audio_generator.manifest = Manifest(os.path.join(args.output_dir, 'manifest.jsonl'))
+    audio_generator.index = DatasetIndex(os.path.join(args.output_dir, INDEX_FILENAME))
+
+    # Conversations whose audio an earlier run already finished count towards their cell; only the shortfall is generated
+    done = {
+        record['file_id']: (record['scam_type'], record['language'])
+        for record in audio_generator.manifest.done_records('conversation')
+    }
+    planned = plan_jobs(planner, args.num_conversations, args.seed, args.shard_index, args.num_shards)
+    jobs = planner.replan(planned, done)
+    if len(jobs) < len(planned):
+        print(f"Resuming: {len(planned) - len(jobs)} conversations already completed by earlier runs")
+
+    metadata_file = os.path.join(args.output_dir, 'dataset_metadata.csv')
+    write_header = not os.path.exists(metadata_file) or os.path.getsize(metadata_file) == 0
+    metadata_f = open(metadata_file, 'a', newline='', encoding='utf-8')
+    metadata_writer = csv.DictWriter(metadata_f, fieldnames=METADATA_FIELDNAMES)
+    if write_header:
+        metadata_writer.writeheader()
+
+    # Full queue = synthesis is behind: producers block on put() and stop asking Gemini for more
+    queue = asyncio.Queue(maxsize=args.queue_size)
+    stats = PipelineStats(args.queue_size)
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=args.workers)
+    batches = [jobs[i:i + args.batch_size] for i in range(0, len(jobs), args.batch_size)]
+    pending_batches = asyncio.Queue()
+    for batch in batches:
+        pending_batches.put_nowait(batch)
+
+    async def produce():
+        """Generate text for one batch at a time and hand each parsed conversation to the TTS stage"""
+        while not pending_batches.empty():
+            batch = pending_batches.get_nowait()
+            if len(batch) == 1:
+                conversation_id, scam_type, language, _ = batch[0]
+                conversations = [await loop.run_in_executor(
+                    executor, text_generator.generate_conversation, scam_type, language, conversation_id
+                )]
+            else:
+                conversations = await loop.run_in_executor(
+                    executor, text_generator.generate_conversation_batch,
+                    [(scam_type, language, conversation_id) for conversation_id, scam_type, language, _ in batch]
+                )
+
+            for job, conversation in zip(batch, conversations):
+                if conversation is None:
+                    stats.generation_failed += 1
+                    continue
+                conversation['voice_slot'] = job[3]
+                stats.generated += 1
+                await queue.put(conversation)
+                stats.sample_queue(queue.qsize())
+
+    async def consume():
+        """Synthesize conversations as soon as they are parsed"""
+        while True:
+            conversation = await queue.get()
+            if conversation is None:
+                return
+            stats.sample_queue(queue.qsize())
+
+            try:
+                result = await audio_generator.synthesize_conversation(
+                    conversation, args.output_dir, args.audio_format, args.output_mode
+                )
+            except Exception as e:
+                # A consumer that died would leave producers blocked on a full queue forever
+                print(f"Error synthesizing {conversation['file_id']}: {e}")
+                result = None
+            if result and not result.get('skipped'):
+                metadata_writer.writerow(build_metadata_row(result, args.audio_format))
+                metadata_f.flush()
+                stats.synthesized += 1
+                stats.segments += result['num_segments']
+            elif not result:
+                stats.synthesis_failed += 1
+
+    progress = ProgressReporter(
+        lambda: (f"[{metrics.elapsed():6.1f}s] queue {queue.qsize()}/{args.queue_size} | "
+                 f"{text_progress(metrics)} | {audio_progress(metrics)}"),
+        interval=args.progress_interval, metrics=metrics, metrics_file=args.metrics_file
+    ).start()
+    consumers = [asyncio.create_task(consume()) for _ in range(args.max_concurrent_conversations)]
+    try:
+        await asyncio.gather(*(produce() for _ in range(args.workers)))
+        for _ in consumers:
+            await queue.put(None)
+        await asyncio.gather(*consumers)
+    finally:
+        progress.stop()
+        executor.shutdown()
+        audio_generator.close()
+        metadata_f.close()
+
+    dataset_metadata = write_dataset_metadata(metadata_file, audio_generator.manifest)
+    audio_generator.manifest.close()
+    audio_generator.index.close()
+
+    print(f"\nPipeline completed!")
+    print(stats.summary())
+    print(f"Requests: {text_generator.num_requests} ({text_generator.conversations_per_request():.2f} conversations/request)")
+    print(text_generator.parser.summary())
+    print(planner.coverage(planned, {
+        record['file_id']: (record['scam_type'], record['language'])
+        for record in audio_generator.manifest.done_records('conversation')
+    }))
+    if audio_generator.cache:
+        print(audio_generator.cache.summary())
+    if args.metrics_file:
+        print(f"Metrics saved: {args.metrics_file}")
+    print(f"Dataset metadata saved: {metadata_file} ({len(dataset_metadata)} conversations)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+# manifest.py
+# Append-only JSONL manifest that lets pipeline runs resume where they stopped
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+
+def content_hash(*parts):
+    """Stable SHA-256 key for a work item, from any JSON-serializable parts"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class Manifest:
+    """Append-only log of work item states; when a key appears several times, the last record wins"""
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        self.lock = threading.Lock()
+
+        if os.path.exists(path):
+            complete_bytes = 0
+            with open(path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    complete_bytes += len(line)
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.records[record['key']] = record
+            # A crash can leave a truncated last line behind; cut it off so the next record starts on a line of its own
+            if complete_bytes < os.path.getsize(path):
+                os.truncate(path, complete_bytes)
+
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def get(self, key):
+        """Latest record for `key`, or None"""
+        return self.records.get(key)
+
+    def is_done(self, key):
+        record = self.records.get(key)
+        return record is not None and record['status'] == 'done'
+
+    def record(self, key, status, **fields):
+        """Append a new state for `key` and flush it to disk immediately"""
+        record = {'key': key, 'status': status, 'updated': datetime.now().isoformat(), **fields}
+        with self.lock:
+            self.records[key] = record
+            self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self.file.flush()
+        return record
+
+    def done_records(self, kind=None):
+        """All records currently marked done, optionally filtered by their `kind` field"""
+        return [
+            record for record in self.records.values()
+            if record['status'] == 'done' and (kind is None or record.get('kind') == kind)
+        ]
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,51 @@
+# merge_metadata.py
+# Combines the metadata CSVs of a run split with --shard-index/--num-shards into one file
+import argparse
+import csv
+import os
+import sys
+
+from partition import conversation_file_id, merge_metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge per-shard metadata into one dataset_metadata.csv')
+    parser.add_argument('--input-dirs', nargs='+', required=True, help='Output directories of the individual shards')
+    parser.add_argument('--metadata-name', default='dataset_metadata.csv',
+                        help='Metadata file in each directory: dataset_metadata.csv (audio) or metadata.csv (conversations)')
+    parser.add_argument('--output', default='dataset_metadata.csv', help='Merged metadata file')
+    parser.add_argument('--num-conversations', type=int, default=None, help='Expected total, to report conversations no shard produced')
+
+    args = parser.parse_args()
+
+    paths = []
+    for input_dir in args.input_dirs:
+        path = os.path.join(input_dir, args.metadata_name)
+        if os.path.exists(path):
+            paths.append(path)
+        else:
+            print(f"No {args.metadata_name} in '{input_dir}', skipping")
+    if not paths:
+        parser.error(f"None of the input directories contain {args.metadata_name}")
+
+    fieldnames, rows, conflicts = merge_metadata(paths)
+    if conflicts:
+        # The same ID with different content means two shards generated it: the runs were not partitioned alike
+        print(f"❌ {len(conflicts)} conversations differ between shards: {', '.join(conflicts[:10])}")
+        sys.exit(1)
+
+    with open(args.output, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"Merged {len(rows)} conversations from {len(paths)} shards into {args.output}")
+    if args.num_conversations:
+        found = {row['file_id'] for row in rows}
+        missing = [conversation_file_id(i) for i in range(args.num_conversations) if conversation_file_id(i) not in found]
+        if missing:
+            print(f"Missing {len(missing)} conversations: {', '.join(missing[:10])}{' ...' if len(missing) > 10 else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# metrics.py
+# Counters and latency histograms for the pipeline stages, JSON / Prometheus export and a live progress line
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets, Prometheus style
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 7.5, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+def add_metrics_arguments(parser):
+    """Command-line options for metrics export and progress reporting"""
+    parser.add_argument('--metrics-file', default=None,
+                        help='Keep up-to-date metrics here: Prometheus text if it ends in .prom, JSON otherwise (default: off)')
+    parser.add_argument('--progress-interval', type=float, default=1.0, help='Seconds between progress updates (default: 1)')
+
+
+class Histogram:
+    """Bucketed latency distribution; percentiles are interpolated within buckets, so memory stays constant"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, q):
+        """Estimated q-th percentile (0-100)"""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                # Interpolate within the bucket, narrowed to the range actually observed
+                lower = max(self.buckets[i - 1] if i > 0 else 0.0, self.min)
+                upper = min(self.buckets[i] if i < len(self.buckets) else self.max, self.max)
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max
+        }
+
+
+class Metrics:
+    """Named counters and latency histograms, shared by the worker threads and the event loop"""
+
+    def __init__(self):
+        self.start_time = time.monotonic()
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def inc(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        with self.lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].observe(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        """Observe the wall time of the block into histogram `name`, including any awaits inside it"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def value(self, name):
+        with self.lock:
+            return self.counters.get(name, 0)
+
+    def rate(self, name):
+        """Per-second rate of counter `name` since the run started"""
+        return self.value(name) / max(self.elapsed(), 1e-9)
+
+    def percentile(self, name, q):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            return histogram.percentile(q) if histogram else 0.0
+
+    def elapsed(self):
+        return time.monotonic() - self.start_time
+
+    def snapshot(self):
+        """Everything recorded so far, as a JSON-serializable dict"""
+        elapsed = max(self.elapsed(), 1e-9)
+        with self.lock:
+            return {
+                'elapsed_sec': round(elapsed, 3),
+                'counters': dict(sorted(self.counters.items())),
+                'rates_per_sec': {name: value / elapsed for name, value in sorted(self.counters.items())},
+                'latency_sec': {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+            }
+
+    def to_prometheus(self, prefix='scam_dataset_'):
+        """Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {prefix}{name} counter")
+                lines.append(f"{prefix}{name} {value}")
+            for name, histogram in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {prefix}{name} histogram")
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{prefix}{name}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}{name}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f"{prefix}{name}_sum {histogram.sum}")
+                lines.append(f"{prefix}{name}_count {histogram.count}")
+        lines.append(f"# TYPE {prefix}elapsed_seconds gauge")
+        lines.append(f"{prefix}elapsed_seconds {self.elapsed():.3f}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Atomically replace `path` with the current metrics (Prometheus text for .prom, JSON otherwise)"""
+        if path.endswith('.prom'):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.snapshot(), indent=2)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+class ProgressReporter:
+    """Background thread that keeps one status line up to date (or prints one per interval when not on a terminal)"""
+
+    def __init__(self, render, interval=1.0, metrics=None, metrics_file=None, stream=sys.stdout):
+        self.render = render
+        self.interval = interval
+        self.metrics = metrics
+        self.metrics_file = metrics_file
+        self.stream = stream
+        self.interactive = stream.isatty()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self._report()
+
+    def _report(self, final=False):
+        line = self.render()
+        if self.interactive:
+            # Clear the previous line and leave the cursor at its start, so other prints overwrite it
+            self.stream.write(f"\033[K{line}\n" if final else f"\033[K{line}\r")
+        else:
+            self.stream.write(line + '\n')
+        self.stream.flush()
+        if self.metrics and self.metrics_file:
+            self.metrics.write(self.metrics_file)
+
+    def stop(self):
+        """Stop the thread and print the final state"""
+        self.stopped.set()
+        self.thread.join()
+        self._report(final=True)
@@ -0,0 +1,67 @@
+# partition.py
+# Deterministic split of a dataset across machines, and per-conversation seeded randomness
+import csv
+import random
+import re
+
+from manifest import content_hash
+
+
+def add_partition_arguments(parser):
+    """Command-line options for splitting a run across several processes or machines"""
+    parser.add_argument('--seed', type=int, default=None, help='Seed for every random choice; all shards of a run must share it (default: random)')
+    parser.add_argument('--shard-index', type=int, default=0, help='Which part of the work this process does, 0-based (default: 0)')
+    parser.add_argument('--num-shards', type=int, default=1, help='Number of processes the work is split across (default: 1)')
+
+
+def resolve_partition_arguments(parser, args):
+    """Validate the partition options and pick a seed when none was given"""
+    if args.num_shards < 1 or not 0 <= args.shard_index < args.num_shards:
+        parser.error(f"--shard-index must be in [0, {args.num_shards})")
+    if args.seed is None:
+        if args.num_shards > 1:
+            parser.error("--seed is required with --num-shards, so every shard plans the same dataset")
+        args.seed = random.SystemRandom().randrange(2 ** 32)
+    print(f"Seed: {args.seed} (shard {args.shard_index + 1} of {args.num_shards})")
+
+
+def conversation_file_id(index):
+    """ID of the index-th conversation (0-based) of a run; the same on every shard"""
+    return f"conv_{index+1:03d}"
+
+
+def file_id_sort_key(file_id):
+    """Sort key that orders IDs by their number, so conv_1000 comes after conv_999 rather than after conv_100"""
+    match = re.search(r'(\d+)$', file_id)
+    return (file_id[:match.start()], int(match.group(1))) if match else (file_id, -1)
+
+
+def owns(file_id, shard_index, num_shards):
+    """Whether `file_id` belongs to the given shard.
+
+    Ownership depends only on the ID, so the shard that generated a conversation's text also
+    synthesizes its audio, whatever other conversations its input directory holds.
+    """
+    return int(content_hash(file_id)[:16], 16) % num_shards == shard_index
+
+
+def item_rng(seed, *parts):
+    """random.Random seeded from the run seed and an item's identity, independent of which shard handles it"""
+    return random.Random(int(content_hash(seed, *parts)[:16], 16))
+
+
+def merge_metadata(paths):
+    """Rows of several per-shard metadata CSVs in ID order; returns (fieldnames, rows, conflicting file_ids)"""
+    fieldnames = None
+    rows = {}
+    conflicts = set()
+    for path in paths:
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            fieldnames = fieldnames or reader.fieldnames
+            for row in reader:
+                existing = rows.get(row['file_id'])
+                if existing is not None and existing != row:
+                    conflicts.add(row['file_id'])
+                rows[row['file_id']] = row
+    return fieldnames, sorted(rows.values(), key=lambda row: file_id_sort_key(row['file_id'])), sorted(conflicts, key=file_id_sort_key)
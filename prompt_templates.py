@@ -0,0 +1,89 @@
+# prompt_templates.py
+# Prompt store for conversation generation, loaded from the prompts/ directory and compiled once
+import os
+from string import Template
+
+DEFAULT_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompts')
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+
+class PromptTemplates:
+    """Prompts for every (scam_type, language) pair.
+
+    Layout of the template directory:
+        prompt.txt                          wrapper with $language_instruction, $scenario and $rules
+        batch_prompt.txt, batch_item.txt    the same, for several conversations in one request
+        rules/<language>.txt                dialogue rules shared by every scam type in that language
+        scenarios/<scam_type>/<language>.txt
+    """
+
+    def __init__(self, language_instructions, template_dir=DEFAULT_TEMPLATE_DIR):
+        self.template_dir = template_dir
+        wrapper = Template(_read(os.path.join(template_dir, 'prompt.txt')))
+        self.batch_wrapper = Template(_read(os.path.join(template_dir, 'batch_prompt.txt')))
+        batch_item = Template(_read(os.path.join(template_dir, 'batch_item.txt')))
+
+        rules_dir = os.path.join(template_dir, 'rules')
+        rules = {
+            os.path.splitext(name)[0]: _read(os.path.join(rules_dir, name))
+            for name in os.listdir(rules_dir) if name.endswith('.txt')
+        }
+
+        # Compile every available pair up front; rendering is then a dict lookup
+        self.compiled = {}
+        self.compiled_batch_items = {}
+        scenarios_dir = os.path.join(template_dir, 'scenarios')
+        for scam_type in sorted(os.listdir(scenarios_dir)):
+            for name in sorted(os.listdir(os.path.join(scenarios_dir, scam_type))):
+                language = os.path.splitext(name)[0]
+                if not name.endswith('.txt') or language not in rules or language not in language_instructions:
+                    continue
+                sections = {
+                    'language_instruction': language_instructions[language],
+                    'scenario': _read(os.path.join(scenarios_dir, scam_type, name)),
+                    'rules': rules[language]
+                }
+                self.compiled[(scam_type, language)] = Template(wrapper.safe_substitute(sections))
+                self.compiled_batch_items[(scam_type, language)] = Template(batch_item.safe_substitute(sections))
+
+    def missing(self, scam_types, languages):
+        """(scam_type, language) pairs without a prompt"""
+        return [
+            (scam_type, language)
+            for scam_type in scam_types for language in languages
+            if (scam_type, language) not in self.compiled
+        ]
+
+    def check_coverage(self, scam_types, languages):
+        """Raise ValueError unless every (scam_type, language) pair has a prompt"""
+        missing = self.missing(scam_types, languages)
+        if missing:
+            pairs = ', '.join(f"{scam_type}/{language}" for scam_type, language in missing)
+            raise ValueError(f"No prompt template in '{self.template_dir}' for: {pairs}")
+
+    def render(self, scam_type, language, **variables):
+        """Prompt for one pair; any $placeholders left in the templates are filled from `variables`"""
+        template = self.compiled[(scam_type, language)]
+        if not variables:
+            return template.template
+        return template.safe_substitute(variables)
+
+    def render_many(self, pairs, **variables):
+        """Prompts for a batch of (scam_type, language) pairs, in order"""
+        return [self.render(scam_type, language, **variables) for scam_type, language in pairs]
+
+    def render_batch(self, pairs, **variables):
+        """Single prompt asking for one conversation per (scam_type, language) pair, numbered from 1"""
+        items = [
+            self.compiled_batch_items[(scam_type, language)].safe_substitute(variables, index=index)
+            for index, (scam_type, language) in enumerate(pairs, 1)
+        ]
+        return self.batch_wrapper.safe_substitute(
+            variables,
+            num_conversations=len(pairs),
+            conversations='\n\n'.join(items)
+        )
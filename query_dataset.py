@@ -0,0 +1,89 @@
+# query_dataset.py
+# Coverage and duration statistics from the SQLite index of an audio dataset (dataset_index.py)
+import argparse
+import os
+import sqlite3
+import sys
+
+from dataset_index import CONVERSATION_COLUMNS, INDEX_FILENAME, DatasetIndex, load_diarization
+from manifest import Manifest
+
+
+def print_table(header, rows):
+    """Rows as aligned columns"""
+    rows = [[f"{value:.2f}" if isinstance(value, float) else str(value) for value in row] for row in rows]
+    widths = [max(len(str(cell)) for cell in column) for column in zip(header, *rows)]
+    print('  '.join(str(cell).ljust(width) for cell, width in zip(header, widths)))
+    for row in rows:
+        print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)))
+
+
+def build_index(index, dataset_dirs):
+    """Index every finished conversation recorded in the manifests of `dataset_dirs`; returns (added, missing)"""
+    added = missing = 0
+    for dataset_dir in dataset_dirs:
+        manifest = Manifest(os.path.join(dataset_dir, 'manifest.jsonl'))
+        for record in manifest.done_records('conversation'):
+            diarization = load_diarization(record['result'])
+            if diarization is None:
+                missing += 1
+                continue
+            audio_format = record.get('metadata', {}).get('audio_format', 'wav')
+            index.add_conversation(diarization['scam_type'], audio_format, record['voice_plan'], diarization, record['result'])
+            added += 1
+        manifest.close()
+    return added, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the index of an audio dataset')
+    parser.add_argument('--index', default=os.path.join('audio_dataset', INDEX_FILENAME),
+                        help=f'Index file (default: audio_dataset/{INDEX_FILENAME})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    stats_parser = commands.add_parser('stats', help='Totals and coverage per language and scam type')
+    stats_parser.add_argument('--group-by', nargs='+', default=['language', 'scam_type'], choices=CONVERSATION_COLUMNS,
+                              help='Columns to break the totals down by (default: language scam_type)')
+    for column in CONVERSATION_COLUMNS:
+        stats_parser.add_argument(f"--{column.replace('_', '-')}", dest=column, default=None, help=f'Only conversations with this {column}')
+
+    sql_parser = commands.add_parser('sql', help='Run an SQL query against the conversations and segments tables')
+    sql_parser.add_argument('query', help='e.g. "SELECT voice, SUM(duration_sec) / 3600 FROM segments GROUP BY voice"')
+
+    build_parser = commands.add_parser('build', help='(Re)build the index from the manifests of finished datasets, e.g. to merge shards')
+    build_parser.add_argument('--dataset-dirs', nargs='+', required=True, help='Output directories of generate_audio.py / generate_dataset.py')
+
+    args = parser.parse_args()
+
+    if args.command != 'build' and not os.path.exists(args.index):
+        parser.error(f"No index at '{args.index}'")
+    # Queries never modify the index, so they are safe to run while a generation run is writing to it
+    index = DatasetIndex(args.index, read_only=args.command != 'build')
+
+    if args.command == 'build':
+        added, missing = build_index(index, args.dataset_dirs)
+        print(f"Indexed {added} conversations into {args.index}")
+        if missing:
+            print(f"{missing} finished conversations have no diarization file any more (moved or deleted), skipped")
+
+    elif args.command == 'stats':
+        filters = {column: getattr(args, column) for column in CONVERSATION_COLUMNS if getattr(args, column) is not None}
+        rows = index.summarize(filters, args.group_by)
+        print_table(args.group_by + ['conversations', 'hours', 'segments', 'overlap_hours'], rows)
+        if rows:
+            total = index.summarize(filters)[0]
+            print(f"\nTotal: {total[0]} conversations, {total[1]:.2f} hours, {total[2]} segments in {len(rows)} groups")
+
+    elif args.command == 'sql':
+        try:
+            header, rows = index.query(args.query)
+        except sqlite3.Error as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print_table(header, rows)
+
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# quota_planner.py
+# Exact, balanced generation plans from per-stratum quotas, and re-planning of the cells a run left unfilled
+import json
+from collections import Counter
+
+from partition import conversation_file_id, file_id_sort_key, item_rng
+
+
+def allocate(total, weights, rng=None):
+    """Split `total` across cells in proportion to `weights`; largest remainders get the leftover units, so counts sum exactly.
+
+    Equal remainders (e.g. an even split) are ordered by `rng`, so the extra units do not always go to the first cells.
+    """
+    weight_sum = sum(weights.values())
+    shares = {cell: total * weight / weight_sum for cell, weight in weights.items()}
+    counts = {cell: int(share) for cell, share in shares.items()}
+    leftover = total - sum(counts.values())
+    cells = sorted(shares)
+    if rng is not None:
+        rng.shuffle(cells)  # The stable sort below keeps this order among ties
+    for cell in sorted(cells, key=lambda cell: counts[cell] - shares[cell])[:leftover]:
+        counts[cell] += 1
+    return counts
+
+
+def interleave(counts, rng):
+    """Sequence of cells in which each cell is spread evenly, so any prefix of the plan is balanced too"""
+    cells = sorted(counts)
+    rng.shuffle(cells)  # Breaks ties between cells without favouring any in particular
+    order = {cell: i for i, cell in enumerate(cells)}
+    slots = [((j + 0.5) / count, order[cell], cell) for cell, count in counts.items() for j in range(count)]
+    return [cell for _, _, cell in sorted(slots)]
+
+
+def load_quotas(path):
+    """Target counts from a JSON file of {"<scam_type>/<language>": count}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+    return {tuple(key.split('/', 1)): count for key, count in raw.items()}
+
+
+class QuotaPlanner:
+    """Plans which scam type, language and voice slot every conversation of a run gets.
+
+    Targets are exact counts per (scam_type, language) cell: either given as quotas, or an even split of
+    the total. Within each language, conversations are numbered with consecutive voice slots, which the
+    audio stage maps round-robin onto that language's voice pairs.
+    """
+
+    def __init__(self, scam_types, languages, quotas=None):
+        self.scam_types = list(scam_types)
+        self.languages = list(languages)
+        self.quotas = quotas
+
+        if quotas:
+            unknown = [cell for cell in quotas if cell[0] not in self.scam_types or cell[1] not in self.languages]
+            if unknown:
+                raise ValueError(f"Unknown quota cells: {', '.join('/'.join(cell) for cell in unknown)}")
+
+    def targets(self, num_conversations, rng=None):
+        """Exact count per (scam_type, language) cell; `rng` picks the cells that get the remainder of an even split"""
+        if self.quotas:
+            return {cell: count for cell, count in self.quotas.items() if count > 0}
+        cells = [(scam_type, language) for scam_type in self.scam_types for language in self.languages]
+        return allocate(num_conversations, {cell: 1 for cell in cells}, rng)
+
+    def plan(self, num_conversations, seed):
+        """(conversation_id, scam_type, language, voice_slot) for every conversation of the run"""
+        cells = interleave(self.targets(num_conversations, item_rng(seed, 'targets')), item_rng(seed, 'plan'))
+        voice_slots = Counter()
+        jobs = []
+        for i, (scam_type, language) in enumerate(cells):
+            jobs.append((conversation_file_id(i), scam_type, language, voice_slots[language]))
+            voice_slots[language] += 1
+        return jobs
+
+    def replan(self, planned, done):
+        """Jobs still to run, given `done` = {conversation_id: (scam_type, language)} from earlier runs.
+
+        Cells are refilled only up to their target: an unfinished ID keeps its planned cell while that cell
+        is short, and otherwise takes over a cell that earlier runs (e.g. with another seed or other quotas) left short.
+        """
+        targets = Counter((scam_type, language) for _, scam_type, language, _ in planned)
+        have = Counter(done[job[0]] for job in planned if job[0] in done)
+        deficit = targets - have
+
+        pending = []
+        reassign = []
+        for job in planned:
+            conversation_id, scam_type, language, voice_slot = job
+            if conversation_id in done:
+                continue
+            if deficit[(scam_type, language)] > 0:
+                deficit[(scam_type, language)] -= 1
+                pending.append(job)
+            else:
+                reassign.append(job)
+
+        # Remaining shortfall goes to unfinished IDs whose planned cell is already full
+        leftover = [cell for cell in sorted(deficit) for _ in range(deficit[cell])]
+        for (conversation_id, _, _, voice_slot), (scam_type, language) in zip(reassign, leftover):
+            pending.append((conversation_id, scam_type, language, voice_slot))
+        return sorted(pending, key=lambda job: file_id_sort_key(job[0]))
+
+    def coverage(self, planned, done):
+        """One-line summary of how many planned cells are complete"""
+        targets = Counter((scam_type, language) for _, scam_type, language, _ in planned)
+        have = Counter(done.values())
+        short = {cell: count - have[cell] for cell, count in targets.items() if have[cell] < count}
+        missing = sum(short.values())
+        return f"Coverage: {len(targets) - len(short)}/{len(targets)} cells complete, {missing} conversations missing"
@@ -0,0 +1,113 @@
+# response_parser.py
+# Single-pass parser and validator for the dialogue text Gemini returns
+import re
+import threading
+from collections import Counter
+
+# A speaker label at the start of a line, tolerating markdown and punctuation variants:
+#   VICTIM:  **SCAMMER:**  **Scammer**:  - Victim:  SCAMMER (urgently):  Scammer -
+LABEL_RE = re.compile(
+    r'^[ \t>#*_-]*'
+    r'(victim|scammer)'
+    r'[ \t*_]*(?:\([^)\n]*\)[ \t*_]*)?'
+    r'(?:[:：]|[-–—](?=[ \t]))'
+    r'[*_]*[ \t]*',
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Stage directions and sound cues: (sighs), [pause] or *rustling sounds* right after the speaker label,
+# (sighs) or [pause] on a line of their own, *rustling sounds* at the end of a turn, and a short *sighs*
+# anywhere (the prompts forbid asterisked actions, so the model's slips are cues, not words to speak).
+# Brackets inside a sentence are usually part of what is said: "my account (the savings one)"
+STAGE_DIRECTION_RE = re.compile(
+    r'\A(?:\s*(?:\([^)\n]*\)|\[[^\]\n]*\]|\*[^*\n]+\*))+'
+    r'|^[ \t]*(?:\([^)\n]*\)|\[[^\]\n]*\])[ \t]*$'
+    r'|\*[^*\n]+\*\s*\Z'
+    r'|(?<!\*)\*[^*\n]{1,40}\*(?!\*)',
+    re.MULTILINE
+)
+# **Bold** and longer asterisked runs left in the middle of a sentence are markdown emphasis: keep the words
+EMPHASIS_RE = re.compile(r'\*+([^*\n]+)\*+')
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Rejection reasons
+NO_TURNS = 'no_turns'
+SINGLE_SPEAKER = 'single_speaker'
+TOO_FEW_TURNS = 'too_few_turns'
+
+
+class DialogueParser:
+    """Turns raw model output into validated, strictly alternating VICTIM/SCAMMER segments.
+
+    Repairs that keep a conversation usable (markdown labels, stage directions, consecutive turns by the
+    same speaker) are applied silently and counted; anything that leaves it unusable is rejected with a reason.
+    """
+
+    def __init__(self, min_turns=8):
+        self.min_turns = min_turns
+        # Running totals over every response parsed, shared by worker threads
+        self.rejections = Counter()
+        self.repairs = Counter()
+        self.lock = threading.Lock()
+
+    def parse(self, text):
+        """Parse dialogue text; returns (segments, rejection_reasons)"""
+        repairs = Counter()
+        matches = list(LABEL_RE.finditer(text))
+        if matches and text[:matches[0].start()].strip():
+            repairs['preamble_dropped'] += 1
+
+        turns = []
+        for match, next_match in zip(matches, matches[1:] + [None]):
+            end = next_match.start() if next_match else len(text)
+            turns.append((match.group(1), text[match.end():end]))
+        return self.validate_turns(turns, repairs)
+
+    def validate_turns(self, turns, repairs=None):
+        """Normalize (speaker, text) pairs, merge same-speaker runs and validate; returns (segments, rejection_reasons)"""
+        repairs = repairs if repairs is not None else Counter()
+        segments = []
+        for speaker, text in turns:
+            speaker = speaker.strip().upper()
+            if speaker not in ('VICTIM', 'SCAMMER'):
+                repairs['unknown_speaker_dropped'] += 1
+                continue
+
+            cleaned, num_directions = STAGE_DIRECTION_RE.subn(' ', text)
+            repairs['stage_direction_removed'] += num_directions
+            cleaned = EMPHASIS_RE.sub(r'\1', cleaned)
+            cleaned = WHITESPACE_RE.sub(' ', cleaned).strip().strip('*_').strip()
+            if not cleaned:
+                repairs['empty_turn_dropped'] += 1
+                continue
+
+            if segments and segments[-1]['speaker'] == speaker:
+                # Enforce strict alternation by joining consecutive lines of the same speaker
+                segments[-1]['text'] += ' ' + cleaned
+                repairs['same_speaker_merged'] += 1
+                continue
+
+            segments.append({
+                'speaker': speaker,
+                'role': 'victim' if speaker == 'VICTIM' else 'scammer',
+                'text': cleaned
+            })
+
+        reasons = []
+        if not segments:
+            reasons.append(NO_TURNS)
+        else:
+            if len({segment['speaker'] for segment in segments}) < 2:
+                reasons.append(SINGLE_SPEAKER)
+            if len(segments) < self.min_turns:
+                reasons.append(TOO_FEW_TURNS)
+
+        with self.lock:
+            self.repairs.update(+repairs)
+            self.rejections.update(reasons)
+        return segments, reasons
+
+    def summary(self):
+        rejections = ', '.join(f"{reason}={count}" for reason, count in self.rejections.most_common()) or 'none'
+        repairs = ', '.join(f"{repair}={count}" for repair, count in self.repairs.most_common()) or 'none'
+        return f"Rejected: {rejections}; repaired: {repairs}"
@@ -0,0 +1,160 @@
+# shard_writer.py
+# Packs conversations (audio plus aligned labels) into fixed-size WebDataset-style tar shards with an index
+import csv
+import os
+import tarfile
+
+SHARD_NAME = "shard-{:06d}.tar"
+INDEX_FILENAME = "index.csv"
+INDEX_FIELDNAMES = ['file_id', 'shard', 'member', 'offset', 'size']
+
+
+def sample_member_name(file_id, filename):
+    """Tar member name for a file of a conversation directory, WebDataset style: <file_id>.<extension>
+
+    conv_001_diarization.json -> conv_001.diarization.json, conv_001.wav -> conv_001.wav,
+    segment_003.wav -> conv_001.segment_003.wav
+    """
+    if filename.startswith(file_id):
+        filename = filename[len(file_id):].lstrip('._')
+    return f"{file_id}.{filename}"
+
+
+class ShardWriter:
+    """Appends conversation samples to tar shards, starting a new shard once the current one reaches its size limit.
+
+    A shard is written under a temporary name and only renamed and added to the index once it is complete,
+    so an interrupted run never leaves a partial shard that the index points into. Until then its samples
+    exist only in the temporary file, which the next run discards: callers must keep the sources of a sample
+    until `on_shard_finished(shard_name, file_ids)` reports its shard complete.
+    """
+
+    def __init__(self, shard_dir, max_shard_bytes=1 << 30, on_shard_finished=None):
+        self.shard_dir = shard_dir
+        self.max_shard_bytes = max_shard_bytes
+        self.on_shard_finished = on_shard_finished
+        self.index_file = os.path.join(shard_dir, INDEX_FILENAME)
+        self.packed = set()
+        self.next_shard = 0
+
+        self.tar = None
+        self.shard_name = None
+        self.pending_rows = []
+
+        os.makedirs(shard_dir, exist_ok=True)
+        for name in os.listdir(shard_dir):
+            if name.endswith('.tar.tmp'):
+                # Left behind by an interrupted run; its samples were never indexed and their sources still exist
+                os.remove(os.path.join(shard_dir, name))
+            elif name.startswith('shard-') and name.endswith('.tar'):
+                self.next_shard = max(self.next_shard, int(name[len('shard-'):-len('.tar')]) + 1)
+
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'r', newline='', encoding='utf-8') as f:
+                self.packed = {row['file_id'] for row in csv.DictReader(f)}
+
+    def contains(self, file_id):
+        """Whether `file_id` is in a completed shard"""
+        return file_id in self.packed
+
+    def add_sample(self, file_id, files):
+        """Append one sample, given as (filename, path) pairs, to the current shard; returns the shard's name"""
+        if self.tar is None:
+            self._open_shard()
+
+        for filename, path in files:
+            tarinfo = self.tar.gettarinfo(path, arcname=sample_member_name(file_id, filename))
+            # Readers seek to each member's data and WebDataset skips anything else, so every member must be a plain file
+            if not tarinfo.isreg():
+                raise ValueError(f"Not a regular file: {path}")
+            # Local user and group names mean nothing to whoever reads the shard
+            tarinfo.uid = tarinfo.gid = 0
+            tarinfo.uname = tarinfo.gname = ''
+            # A USTAR header is a single block, so the data starts right after it
+            data_offset = self.tar.offset + tarfile.BLOCKSIZE
+            with open(path, 'rb') as f:
+                self.tar.addfile(tarinfo, f)
+            self.pending_rows.append({
+                'file_id': file_id,
+                'shard': self.shard_name,
+                'member': tarinfo.name,
+                'offset': data_offset,
+                'size': tarinfo.size
+            })
+
+        shard_name = self.shard_name
+        # Samples are never split across shards, so a shard may run over the limit by one sample
+        if self.tar.fileobj.tell() >= self.max_shard_bytes:
+            self._finish_shard()
+        return shard_name
+
+    def add_conversation_dir(self, file_id, conv_dir):
+        """Pack every file of a per-conversation output directory as one sample; returns the shard's name"""
+        files = [(name, os.path.join(conv_dir, name)) for name in sorted(os.listdir(conv_dir))]
+        return self.add_sample(file_id, files)
+
+    def _open_shard(self):
+        self.shard_name = SHARD_NAME.format(self.next_shard)
+        self.next_shard += 1
+        # Segments hardlinked from the TTS cache share inodes; dereferencing stores each one as a full copy
+        # instead of as a zero-byte link to an earlier member
+        self.tar = tarfile.open(os.path.join(self.shard_dir, self.shard_name + '.tmp'), 'w', format=tarfile.USTAR_FORMAT, dereference=True)
+
+    def _finish_shard(self):
+        self.tar.close()
+        self.tar = None
+        shard_path = os.path.join(self.shard_dir, self.shard_name)
+        os.replace(shard_path + '.tmp', shard_path)
+
+        write_header = not os.path.exists(self.index_file)
+        with open(self.index_file, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=INDEX_FIELDNAMES)
+            if write_header:
+                writer.writeheader()
+            writer.writerows(self.pending_rows)
+        file_ids = list(dict.fromkeys(row['file_id'] for row in self.pending_rows))
+        self.packed.update(file_ids)
+        self.pending_rows = []
+        if self.on_shard_finished:
+            self.on_shard_finished(self.shard_name, file_ids)
+
+    def close(self):
+        """Complete the current shard, if any"""
+        if self.tar is not None:
+            self._finish_shard()
+
+
+def load_index(shard_dir):
+    """Map of file_id -> list of index rows (shard, member, offset, size)"""
+    index = {}
+    with open(os.path.join(shard_dir, INDEX_FILENAME), 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            row['offset'] = int(row['offset'])
+            row['size'] = int(row['size'])
+            index.setdefault(row['file_id'], []).append(row)
+    return index
+
+
+def read_sample(shard_dir, rows):
+    """Random access to one sample through its index rows; returns {member name: bytes}"""
+    sample = {}
+    for row in rows:
+        with open(os.path.join(shard_dir, row['shard']), 'rb') as f:
+            f.seek(row['offset'])
+            sample[row['member']] = f.read(row['size'])
+    return sample
+
+
+def iter_samples(shard_path):
+    """Sequentially read a shard, yielding (file_id, {member name: bytes}) per sample"""
+    file_id, sample = None, {}
+    with tarfile.open(shard_path, 'r') as tar:
+        for member in tar:
+            key = member.name.split('.', 1)[0]
+            if key != file_id and sample:
+                yield file_id, sample
+                sample = {}
+            file_id = key
+            sample[member.name] = tar.extractfile(member).read()
+    if sample:
+        yield file_id, sample
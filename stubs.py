@@ -0,0 +1,143 @@
+# stubs.py
+# Local stand-ins for the remote services, used to run and time the pipeline offline
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+
+from google.genai import errors
+
+# A single silent MPEG-2 Layer III frame: 24 kHz, 48 kbit/s, mono (the format Edge TTS streams)
+MP3_FRAME_HEADER = bytes([0xFF, 0xF3, 0x64, 0xC0])
+MP3_FRAME_SIZE = 144
+MP3_FRAME_SECONDS = 576 / 24000
+SILENT_MP3_FRAME = MP3_FRAME_HEADER + bytes(MP3_FRAME_SIZE - len(MP3_FRAME_HEADER))
+
+
+class StubCommunicate:
+    """Drop-in replacement for edge_tts.Communicate that never touches the network"""
+
+    def __init__(self, text, voice, rate="+0%", volume="+0%", pitch="+0Hz", latency=0.2, seconds_per_word=0.35,
+                 jitter=0.0, error_rate=0.0, rng=random):
+        self.text = text
+        self.voice = voice
+        self.rate = rate
+        self.volume = volume
+        self.pitch = pitch
+        self.latency = latency
+        self.seconds_per_word = seconds_per_word
+        self.jitter = jitter
+        # Fraction of requests that fail like a dropped connection
+        self.error_rate = error_rate
+        self.rng = rng
+
+    def _num_frames(self):
+        duration = max(1.0, len(self.text.split()) * self.seconds_per_word)
+        return int(duration / MP3_FRAME_SECONDS)
+
+    async def stream(self):
+        """Yield silent audio chunks after the configured round-trip latency"""
+        await asyncio.sleep(max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)))
+        if self.rng.random() < self.error_rate:
+            raise ConnectionResetError("Simulated TTS connection failure")
+        num_frames = self._num_frames()
+        # Edge TTS delivers audio in chunks of a few frames each
+        for start in range(0, num_frames, 16):
+            yield {"type": "audio", "data": SILENT_MP3_FRAME * min(16, num_frames - start)}
+
+    async def save(self, audio_fname, metadata_fname=None):
+        """Write the stub audio to disk, mirroring edge_tts.Communicate.save"""
+        with open(audio_fname, "wb") as f:
+            async for chunk in self.stream():
+                if chunk["type"] == "audio":
+                    f.write(chunk["data"])
+
+
+class _FakeUsage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class _FakeResponse:
+    def __init__(self, text, usage_metadata):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class _FakeModels:
+    def __init__(self, client):
+        self._client = client
+
+    def generate_content(self, model, contents, config=None):
+        return self._client._generate(contents, config)
+
+
+class FakeGenaiClient:
+    """Stand-in for genai.Client with simulated latency and 429 quota errors"""
+
+    # Canned dialogue returned for every request
+    RESPONSE_LINES = [
+        "VICTIM: Hello? Who is this?",
+        "SCAMMER: Good afternoon, I am calling from the security department of your bank.",
+        "VICTIM: Um, okay... is something wrong with my account?",
+        "SCAMMER: We noticed a suspicious transaction of forty thousand rupees from your debit card.",
+        "VICTIM: What? I did not make any such payment.",
+        "SCAMMER: Don't worry, we can block it right now. I just need to verify the OTP sent to your phone.",
+        "VICTIM: The bank always says never to share the OTP with anyone.",
+        "SCAMMER: Sir, this is the bank itself calling. If you don't verify, the money will be gone.",
+        "VICTIM: I think I will call the number on the back of my card instead.",
+        "SCAMMER: There is no time for that, the transaction will complete in two minutes!",
+        "VICTIM: Then I will take that chance. Goodbye.",
+        "SCAMMER: Sir, please listen...",
+    ]
+
+    def __init__(self, latency=0.5, jitter=0.1, error_rate=0.0, bad_item_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        # Fraction of conversations in a batch response that come back unusable
+        self.bad_item_rate = bad_item_rate
+        self.models = _FakeModels(self)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.quota_errors = 0
+
+    def _generate(self, contents, config=None):
+        # Batch prompts number their conversations with "### Conversation N" headings
+        num_items = len(re.findall(r'^### Conversation \d+', str(contents), flags=re.MULTILINE))
+        batch = config is not None and getattr(config, 'response_mime_type', None) == "application/json"
+
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.quota_errors += 1
+            bad_items = {i for i in range(num_items) if self._random.random() < self.bad_item_rate}
+
+        time.sleep(delay)
+        if fail:
+            raise errors.ClientError(429, {"error": {
+                "code": 429,
+                "message": "Resource has been exhausted (e.g. check quota).",
+                "status": "RESOURCE_EXHAUSTED"
+            }})
+
+        if batch:
+            turns = [
+                {"speaker": line.split(":", 1)[0], "text": line.split(":", 1)[1].strip()}
+                for line in self.RESPONSE_LINES
+            ]
+            items = [
+                {"conversation_index": i + 1, "turns": turns[:2] if i in bad_items else turns}
+                for i in range(num_items)
+            ]
+            text = json.dumps(items)
+        else:
+            text = "\n".join(self.RESPONSE_LINES)
+        return _FakeResponse(text, _FakeUsage(len(str(contents)) // 4, len(text) // 4))
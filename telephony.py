@@ -0,0 +1,139 @@
+# telephony.py
+# Phone-line degradation of synthesized speech: 8 kHz narrowband, G.711 mu-law, background noise and packet loss
+import os
+import wave
+
+import numpy as np
+
+from audio_utils import open_wav_writer
+
+TELEPHONY_SAMPLE_RATE = 8000
+TELEPHONY_BAND_HZ = (300, 3400)
+BAND_EDGE_HZ = 100  # Width of the raised-cosine filter edges
+MU = 255
+PACKET_MS = 20
+
+
+def add_telephony_arguments(parser):
+    """Command-line options for the telephony augmentation stage"""
+    parser.add_argument('--telephony', action='store_true',
+                        help='Degrade the audio to a phone call: 8 kHz, 300-3400 Hz, G.711 mu-law, background noise and packet loss (WAV only)')
+    parser.add_argument('--snr-db', type=float, nargs=2, default=[15.0, 35.0], metavar=('MIN', 'MAX'),
+                        help='Range the background noise level of each call is drawn from, as speech-to-noise ratio in dB (default: 15 35)')
+    parser.add_argument('--max-packet-loss', type=float, default=0.03,
+                        help='Upper bound of the packet loss rate drawn for each call (default: 0.03)')
+
+
+class TelephonyAugmenter:
+    """Draws the line conditions of each call; the signal processing itself runs in worker processes (augment_wav_files)"""
+
+    def __init__(self, snr_db=(15.0, 35.0), max_packet_loss=0.03, burst_packets=3):
+        self.snr_db = tuple(snr_db)
+        self.max_packet_loss = max_packet_loss
+        self.burst_packets = burst_packets
+
+    def settings(self):
+        """Configuration that, when changed, makes earlier augmented output stale"""
+        return {'snr_db': list(self.snr_db), 'max_packet_loss': self.max_packet_loss, 'burst_packets': self.burst_packets}
+
+    def plan(self, rng):
+        """Parameters for one call, as recorded in its diarization JSON"""
+        return {
+            'type': 'telephony',
+            'sample_rate': TELEPHONY_SAMPLE_RATE,
+            'band_hz': list(TELEPHONY_BAND_HZ),
+            'codec': 'g711_mulaw',
+            'noise': 'pink',
+            'snr_db': round(rng.uniform(*self.snr_db), 1),
+            'packet_loss': round(rng.uniform(0.0, self.max_packet_loss), 4),
+            'packet_ms': PACKET_MS,
+            'burst_packets': self.burst_packets,
+            'seed': rng.randrange(2 ** 32)
+        }
+
+
+def band_gain(freqs, low, high, edge):
+    """Bandpass gain per frequency, with raised-cosine edges `edge` Hz wide to limit ringing"""
+    ramp = np.clip(np.minimum(freqs - (low - edge), high + edge - freqs) / edge, 0.0, 1.0)
+    return 0.5 - 0.5 * np.cos(np.pi * ramp)
+
+
+def mu_law(x):
+    """G.711 mu-law companding to 8-bit codes and back (the continuous curve, not the segmented table)"""
+    x = np.clip(x, -1.0, 1.0)
+    code = np.round(np.sign(x) * np.log1p(MU * np.abs(x)) / np.log1p(MU) * 127)
+    return np.sign(code) * np.expm1(np.abs(code) / 127 * np.log1p(MU)) / MU
+
+
+def augment_batch(signals, sample_rate, params):
+    """Pass int16 signals through a simulated phone line in one vectorized batch.
+
+    Signals are zero-padded into a 2-D array, so noise, filtering and resampling are single FFTs over the
+    whole batch. Returns the 8 kHz int16 signals and the number of packets lost in them.
+    """
+    rng = np.random.default_rng(params['seed'])
+    lengths = np.array([len(signal) for signal in signals])
+    # Padding after the longest signal keeps the circular FFT filter from wrapping speech around;
+    # rounding up to a multiple of 4096 avoids FFT sizes with large prime factors, which are several times slower
+    n = -(-(int(lengths.max()) + sample_rate // 10) // 4096) * 4096
+    batch = np.zeros((len(signals), n))
+    for i, signal in enumerate(signals):
+        batch[i, :len(signal)] = signal / 32768.0
+    valid = np.arange(n) < lengths[:, None]
+
+    # Pink background noise at the call's SNR, relative to each segment's own level
+    freqs = np.fft.rfftfreq(n, 1.0 / sample_rate)
+    noise = np.fft.irfft(np.fft.rfft(rng.standard_normal(batch.shape), axis=1) / np.sqrt(np.maximum(freqs, 20.0)), n, axis=1)
+    noise *= valid
+    signal_rms = np.sqrt(np.sum(batch ** 2, axis=1) / np.maximum(lengths, 1))
+    noise_rms = np.sqrt(np.sum(noise ** 2, axis=1) / np.maximum(lengths, 1))
+    batch += noise * (signal_rms / np.maximum(noise_rms, 1e-12) / 10 ** (params['snr_db'] / 20))[:, None]
+
+    # Bandpass and resample in one step: filter the spectrum, then invert it at the telephone rate
+    out_n = int(round(n * TELEPHONY_SAMPLE_RATE / sample_rate))
+    spectrum = np.fft.rfft(batch, axis=1) * band_gain(freqs, *params['band_hz'], BAND_EDGE_HZ)
+    line = np.fft.irfft(spectrum, out_n, axis=1) * (out_n / n)
+
+    line = mu_law(line)
+
+    # Bursty packet loss: each lost burst is zeroed, as a receiver without concealment would play it
+    packet = TELEPHONY_SAMPLE_RATE * PACKET_MS // 1000
+    num_packets = -(-out_n // packet)
+    burst = params['burst_packets']
+    starts = rng.random((len(signals), num_packets)) < params['packet_loss'] / burst
+    lost = np.zeros_like(starts)
+    for k in range(burst):
+        lost[:, k:] |= starts[:, :num_packets - k]
+    out_lengths = np.round(lengths * TELEPHONY_SAMPLE_RATE / sample_rate).astype(int)
+    lost &= np.arange(num_packets) * packet < out_lengths[:, None]
+    line *= ~np.repeat(lost, packet, axis=1)[:, :out_n]
+
+    pcm = np.clip(np.round(line * 32767), -32768, 32767).astype('<i2')
+    return [pcm[i, :length] for i, length in enumerate(out_lengths)], int(lost.sum())
+
+
+def augment_wav_files(paths, params):
+    """Replace 16-bit mono WAV files with their telephone-line version; returns the number of lost packets.
+
+    Files already at the telephone rate were augmented by an interrupted run and are left alone.
+    """
+    signals = []
+    todo = []
+    sample_rate = None
+    for path in paths:
+        with wave.open(path, 'rb') as wav:
+            if wav.getframerate() == TELEPHONY_SAMPLE_RATE:
+                continue
+            sample_rate = wav.getframerate()
+            signals.append(np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2'))
+        todo.append(path)
+    if not todo:
+        return 0
+
+    outputs, lost_packets = augment_batch(signals, sample_rate, params)
+    for path, pcm in zip(todo, outputs):
+        tmp_path = f"{path}.tmp"
+        with open_wav_writer(tmp_path, TELEPHONY_SAMPLE_RATE) as wav:
+            wav.writeframes(pcm.tobytes())
+        os.replace(tmp_path, path)
+    return lost_packets
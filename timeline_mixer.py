@@ -0,0 +1,154 @@
+# timeline_mixer.py
+# Turn-taking with overlaps and interruptions, mixed onto one PCM timeline and streamed to disk in blocks
+import numpy as np
+
+from audio_utils import WAV_SAMPLE_RATE
+
+
+def add_turn_taking_arguments(parser):
+    """Command-line options for overlapping speech in conversation files"""
+    parser.add_argument('--overlap-prob', type=float, default=0.0,
+                        help='Chance that a speaker starts before the other one has finished (--output-mode conversation, WAV only; default: 0)')
+    parser.add_argument('--interruption-prob', type=float, default=0.0,
+                        help='Chance that a speaker barges in mid-turn and cuts the other one off (same restrictions; default: 0)')
+    parser.add_argument('--max-overlap', type=float, default=1.0, help='Longest overlap in seconds (default: 1.0)')
+
+
+class TurnTaking:
+    """Draws how each change of speaker happens: after a pause, overlapping the end of the previous turn, or as an interruption"""
+
+    def __init__(self, overlap_prob=0.0, interruption_prob=0.0, max_overlap=1.0):
+        self.overlap_prob = overlap_prob
+        self.interruption_prob = interruption_prob
+        self.max_overlap = max_overlap
+
+    def settings(self):
+        """Configuration that, when changed, makes earlier conversation files stale"""
+        return {'overlap_prob': self.overlap_prob, 'interruption_prob': self.interruption_prob, 'max_overlap': self.max_overlap}
+
+    def plan(self, segments, rng):
+        """Turn of each segment: None (after the pause), or a dict describing its overlap with the previous segment"""
+        turns = []
+        for i, segment in enumerate(segments):
+            # A speaker does not talk over themselves
+            if i == 0 or segment['role'] == segments[i - 1]['role']:
+                turns.append(None)
+                continue
+            draw = rng.random()
+            if draw < self.interruption_prob:
+                # Barge in somewhere in the second half of the previous turn, which trails off shortly after
+                turns.append({
+                    'type': 'interruption',
+                    'at': round(rng.uniform(0.5, 0.85), 3),
+                    'overlap': round(rng.uniform(0.1, 0.5) * self.max_overlap, 3)
+                })
+            elif draw < self.interruption_prob + self.overlap_prob:
+                turns.append({'type': 'overlap', 'overlap': round(rng.uniform(0.1, 1.0) * self.max_overlap, 3)})
+            else:
+                turns.append(None)
+        return turns
+
+
+class TimelineMixer:
+    """Places int16 PCM segments on a shared timeline, sums the overlapping parts and streams the result to a WAV writer.
+
+    Segments must be added in order. The latest one is held back until the next one is placed, because an
+    interruption cuts it short; everything before the start of the held segment is final and is written out.
+    Memory therefore stays around the length of one or two segments, however long the conversation gets.
+    """
+
+    def __init__(self, wav, sample_rate=WAV_SAMPLE_RATE, block_seconds=1.0):
+        self.wav = wav
+        self.sample_rate = sample_rate
+        self.block_samples = int(sample_rate * block_seconds)
+        self.buffer = np.zeros(0, dtype=np.int32)  # Mix from sample `flushed` onwards, with headroom for the sums
+        self.flushed = 0
+        self.held = None
+        self.intervals = []  # [start, end] in samples, per added segment
+        self.interrupted = []  # Positions of segments that were cut off
+        self.mixed_end = 0
+
+    def add(self, pcm, pause=0.0, turn=None):
+        """Place the next segment `pause` seconds after the floor is free, or overlapping as `turn` says"""
+        samples = np.frombuffer(pcm, dtype='<i2').astype(np.int32)
+        if self.held is None:
+            self.held = samples
+            self.intervals.append([0, len(samples)])
+            return
+
+        previous_start, previous_end = self.intervals[-1]
+        floor_end = max(self.mixed_end, previous_end)
+        if turn and turn['type'] == 'interruption':
+            # Not before the segments ahead of the previous one have ended: the interrupting speaker may be
+            # the one still trailing off there
+            start = max(previous_start + int((previous_end - previous_start) * turn['at']), self.mixed_end)
+            # The interrupted speaker trails off, fading out, shortly after the barge-in
+            cut = min(previous_end, start + round(turn['overlap'] * self.sample_rate))
+            if cut < previous_end:
+                self.held = self.held[:cut - previous_start]
+                fade = min(len(self.held), cut - start)
+                if fade > 0:
+                    self.held[-fade:] = self.held[-fade:] * np.linspace(1.0, 0.0, fade)
+                self.intervals[-1][1] = cut
+                self.interrupted.append(len(self.intervals) - 1)
+        elif turn and turn['type'] == 'overlap':
+            # Never start before the middle of the previous segment, nor over the segments before it
+            # (when the previous segment was itself an interruption, the one it cut off may still be trailing off)
+            start = max(previous_start + (previous_end - previous_start) // 2, self.mixed_end,
+                        floor_end - round(turn['overlap'] * self.sample_rate))
+        else:
+            start = floor_end + round(pause * self.sample_rate)
+
+        self._mix(self.held, previous_start)
+        self._flush(start)
+        self.held = samples
+        self.intervals.append([start, start + len(samples)])
+
+    def _mix(self, samples, start):
+        offset = start - self.flushed
+        missing = offset + len(samples) - len(self.buffer)
+        if missing > 0:
+            self.buffer = np.concatenate([self.buffer, np.zeros(missing, dtype=np.int32)])
+        self.buffer[offset:offset + len(samples)] += samples
+        self.mixed_end = max(self.mixed_end, start + len(samples))
+
+    def _flush(self, until):
+        """Write the final mix up to sample `until`, in blocks"""
+        count = until - self.flushed
+        if count <= 0:
+            return
+        if count > len(self.buffer):
+            self.buffer = np.concatenate([self.buffer, np.zeros(count - len(self.buffer), dtype=np.int32)])
+        for offset in range(0, count, self.block_samples):
+            block = self.buffer[offset:min(offset + self.block_samples, count)]
+            self.wav.writeframes(np.clip(block, -32768, 32767).astype('<i2').tobytes())
+        self.buffer = self.buffer[count:].copy()
+        self.flushed = until
+
+    def close(self):
+        """Write out the rest; returns the (start, end) of every added segment in seconds"""
+        if self.held is not None:
+            self._mix(self.held, self.intervals[-1][0])
+            self.held = None
+        self._flush(self.mixed_end)
+        return [(start / self.sample_rate, end / self.sample_rate) for start, end in self.intervals]
+
+
+def overlap_intervals(segments):
+    """Intervals in which more than one speaker talks, from diarization segments with start, end and speaker"""
+    events = sorted([(segment['start'], 1, segment['speaker']) for segment in segments]
+                    + [(segment['end'], -1, segment['speaker']) for segment in segments])
+    active = {}
+    overlaps = []
+    overlap_start = None
+    for time, change, speaker in events:
+        active[speaker] = active.get(speaker, 0) + change
+        speakers = sorted(name for name, count in active.items() if count > 0)
+        if len(speakers) > 1 and overlap_start is None:
+            overlap_start = time
+            overlap_speakers = speakers
+        elif len(speakers) <= 1 and overlap_start is not None:
+            if time > overlap_start:
+                overlaps.append({'start': overlap_start, 'end': time, 'speakers': overlap_speakers})
+            overlap_start = None
+    return overlaps
@@ -0,0 +1,189 @@
+# tts_backends.py
+# Speech synthesis backends: Edge TTS (remote), a local offline formant synthesizer, and the throughput stub
+import abc
+import asyncio
+import math
+import re
+import sys
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import edge_tts
+
+from audio_utils import WAV_SAMPLE_RATE, WAV_SAMPLE_WIDTH
+
+# Edge TTS neural voices per language, by role and gender
+EDGE_VOICES = {
+    "hindi": {
+        "victim_male": ["hi-IN-MadhurNeural"],
+        "victim_female": ["hi-IN-SwaraNeural"],
+        "scammer_male": ["hi-IN-MadhurNeural"],
+        "scammer_female": ["hi-IN-SwaraNeural"]
+    },
+    "hinglish": {
+        "victim_male": ["en-IN-PrabhatNeural", "en-IN-SameerNeural"],
+        "victim_female": ["en-IN-NeerjaNeural", "en-IN-ShrutiNeural"],
+        "scammer_male": ["hi-IN-MadhurNeural", "en-GB-RyanNeural"],
+        "scammer_female": ["hi-IN-SwaraNeural", "en-GB-SoniaNeural"]
+    },
+    "english": {
+        "victim_male": ["en-US-AndrewNeural", "en-GB-RyanNeural"],
+        "victim_female": ["en-US-AriaNeural", "en-GB-SoniaNeural"],
+        "scammer_male": ["en-US-BrianNeural", "en-GB-ThomasNeural"],
+        "scammer_female": ["en-US-JennyNeural", "en-GB-HollieNeural"]
+    }
+}
+
+# Chunk size the local engine streams its PCM in (0.1 s)
+PCM_CHUNK_BYTES = WAV_SAMPLE_RATE // 10 * WAV_SAMPLE_WIDTH
+
+
+class TTSBackend(abc.ABC):
+    """Interface of a speech synthesizer used by AudioConversationGenerator.
+
+    `stream()` yields audio in the backend's output format: MP3 (24 kHz mono, as Edge TTS delivers it)
+    or PCM (16-bit mono at audio_utils.WAV_SAMPLE_RATE). Prosody arguments use Edge TTS syntax:
+    rate="+10%", volume="-5%", pitch="+5Hz".
+    """
+
+    name = None
+    description = None
+
+    @abc.abstractmethod
+    def capabilities(self):
+        """What the backend supports: output_format ('mp3' or 'pcm'), streaming, prosody, offline"""
+
+    @abc.abstractmethod
+    def voices(self):
+        """Voice table, {language: {"victim_male": [...], "victim_female": [...], "scammer_male": [...], "scammer_female": [...]}}"""
+
+    @abc.abstractmethod
+    async def stream(self, text, voice, rate="+0%", volume="+0%", pitch="+0Hz"):
+        """Async iterator of audio chunks (bytes); implementations are async generators"""
+
+    async def synthesize(self, text, voice, rate="+0%", volume="+0%", pitch="+0Hz"):
+        """The whole utterance as one bytes object"""
+        audio = bytearray()
+        async for data in self.stream(text, voice, rate=rate, volume=volume, pitch=pitch):
+            audio += data
+        return bytes(audio)
+
+    def close(self):
+        pass
+
+
+class EdgeBackend(TTSBackend):
+    """Microsoft Edge TTS; `communicate_cls` can be any class with the edge_tts.Communicate interface"""
+
+    name = "edge"
+    description = "Edge TTS"
+
+    def __init__(self, communicate_cls=None):
+        self.communicate_cls = communicate_cls or edge_tts.Communicate
+
+    def capabilities(self):
+        return {'output_format': 'mp3', 'streaming': True, 'prosody': True, 'offline': False}
+
+    def voices(self):
+        return EDGE_VOICES
+
+    async def stream(self, text, voice, rate="+0%", volume="+0%", pitch="+0Hz"):
+        communicate = self.communicate_cls(text, voice, rate=rate, volume=volume, pitch=pitch)
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                yield chunk["data"]
+
+
+class StubBackend(EdgeBackend):
+    """Edge voices rendered as silent MP3 after a simulated round trip (stubs.StubCommunicate), for throughput tests"""
+
+    name = "stub"
+    description = "stub TTS"
+
+    def capabilities(self):
+        return dict(super().capabilities(), offline=True)
+
+
+def parse_prosody(value, unit):
+    """Number in an Edge TTS prosody string such as "+10%" or "-5Hz" """
+    match = re.fullmatch(r'([+-]?\d+(?:\.\d+)?)' + unit, value.strip())
+    return float(match.group(1)) if match else 0.0
+
+
+def synthesize_pcm(text, voice, rate="+0%", volume="+0%", pitch="+0Hz", sample_rate=WAV_SAMPLE_RATE):
+    """Deterministic speech-like PCM for `text`: one voiced, harmonic-rich tone per syllable, with word gaps and phrase pauses.
+
+    The voice name picks the base pitch (male/female) and timbre, so every voice sounds consistently different;
+    runs in worker processes, since it is CPU-bound.
+    """
+    seed = zlib.crc32(voice.encode('utf-8'))
+    base_f0 = (110.0 if '-male-' in voice else 205.0) + seed % 30 - 15 + parse_prosody(pitch, 'Hz')
+    speed = max(0.25, 1.0 + parse_prosody(rate, '%') / 100)
+    amplitude = 9000 * max(0.0, 1.0 + parse_prosody(volume, '%') / 100)
+    # Relative strength of harmonics 1..6, fixed per voice
+    harmonics = [1.0 / (k + 1) * (0.6 + ((seed >> (3 * k)) & 7) / 10) for k in range(6)]
+
+    syllable_samples = int(sample_rate * 0.14 / speed)
+    ramp = max(1, sample_rate // 100)  # 10 ms attack and release, so syllables do not click
+    samples = array('h')
+    for word in re.findall(r"\w+|[,.;:!?]", text):
+        if not word[0].isalnum():
+            pause = 0.12 if word == ',' else 0.3
+            samples.extend(array('h', bytes(int(sample_rate * pause / speed) * 2)))
+            continue
+
+        num_syllables = max(1, len(re.findall(r'[aeiouy]+', word.lower())))
+        for i in range(num_syllables):
+            # Intonation follows the letters, so the same text always sounds the same
+            f0 = base_f0 * (1.0 + ((ord(word[min(i, len(word) - 1)]) * 7 + i) % 13 - 6) / 60)
+            period = max(2, round(sample_rate / f0))
+            cycle = array('h', (
+                int(amplitude * sum(h * math.sin(2 * math.pi * (k + 1) * n / period) for k, h in enumerate(harmonics)) / sum(harmonics))
+                for n in range(period)
+            ))
+            tone = (cycle * (syllable_samples // period + 1))[:syllable_samples]
+            for n in range(min(ramp, len(tone) // 2)):
+                tone[n] = tone[n] * n // ramp
+                tone[-1 - n] = tone[-1 - n] * n // ramp
+            samples.extend(tone)
+        samples.extend(array('h', bytes(int(sample_rate * 0.06 / speed) * 2)))
+
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return samples.tobytes()
+
+
+class LocalBackend(TTSBackend):
+    """Offline formant-style synthesizer running in a process pool; outputs PCM, so it scales with CPU cores"""
+
+    name = "local"
+    description = "local formant synthesizer"
+
+    def __init__(self, workers=None):
+        self.workers = workers
+        self.pool = None
+
+    def capabilities(self):
+        return {'output_format': 'pcm', 'streaming': True, 'prosody': True, 'offline': True}
+
+    def voices(self):
+        voices = {}
+        for language in EDGE_VOICES:
+            voices[language] = {
+                f"{role}_{gender}": [f"local-{language}-{role}-{gender}-{i}" for i in range(2)]
+                for role in ("victim", "scammer") for gender in ("male", "female")
+            }
+        return voices
+
+    async def stream(self, text, voice, rate="+0%", volume="+0%", pitch="+0Hz"):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        pcm = await asyncio.get_running_loop().run_in_executor(self.pool, synthesize_pcm, text, voice, rate, volume, pitch)
+        for start in range(0, len(pcm), PCM_CHUNK_BYTES):
+            yield pcm[start:start + PCM_CHUNK_BYTES]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
@@ -0,0 +1,137 @@
+# tts_cache.py
+# Content-addressed on-disk cache of TTS output with LRU eviction under a byte budget
+import fcntl
+import os
+import shutil
+import uuid
+from collections import OrderedDict
+
+from manifest import content_hash
+
+# ioctl request that clones a file's extents (reflink) on Btrfs/XFS
+FICLONE = 0x40049409
+
+
+class TTSCacheWriter:
+    """Collects a TTS stream into a temporary file; commit() publishes it into the cache"""
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self.path = cache.path_for(key)
+        self.tmp_path = f"{self.path}.tmp-{uuid.uuid4().hex}"
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.tmp_path, 'wb')
+
+    def write(self, data):
+        self.file.write(data)
+
+    def commit(self):
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+        self.cache._add(self.key, os.path.getsize(self.path))
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class TTSCache:
+    """Cache of synthesized MP3 audio keyed on (text, voice, rate, volume, pitch)"""
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> size, least recently used first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Rebuild the LRU order from modification times (refreshed on every hit)
+        found = []
+        for root, _, files in os.walk(cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                if '.tmp-' in name:
+                    # Left behind by an interrupted run
+                    os.remove(path)
+                    continue
+                stat = os.stat(path)
+                found.append((stat.st_mtime, os.path.splitext(name)[0], stat.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total_bytes += size
+
+    def key(self, text, voice, rate, volume, pitch, backend='edge'):
+        if backend == 'edge':
+            return content_hash(text, voice, rate, volume, pitch)
+        # Other backends render the same request differently; Edge keeps the keys of existing caches
+        return content_hash(text, voice, rate, volume, pitch, backend)
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.mp3")
+
+    def contains(self, key):
+        return key in self.entries
+
+    def lookup(self, key):
+        """Path of the cached audio for `key` (counted as a hit), or None (counted as a miss)"""
+        if key not in self.entries:
+            self.misses += 1
+            return None
+
+        path = self.path_for(key)
+        self.hits += 1
+        self.entries.move_to_end(key)
+        os.utime(path)
+        return path
+
+    def link_into(self, key, dest):
+        """Place the cached audio for `key` at `dest` without copying it where the filesystem allows"""
+        path = self.lookup(key)
+        if path is None:
+            return False
+
+        if os.path.exists(dest):
+            os.remove(dest)
+        try:
+            os.link(path, dest)
+        except OSError:
+            # Different filesystem (or no hardlink support): try a reflink, then a plain copy
+            try:
+                with open(path, 'rb') as src, open(dest, 'wb') as dst:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            except OSError:
+                shutil.copyfile(path, dest)
+        return True
+
+    def writer(self, key):
+        return TTSCacheWriter(self, key)
+
+    def _add(self, key, size):
+        if key in self.entries:
+            self.total_bytes -= self.entries.pop(key)
+        self.entries[key] = size
+        self.total_bytes += size
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits its byte budget"""
+        while self.total_bytes > self.max_bytes and self.entries:
+            key, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        hit_rate = 100.0 * self.hits / lookups if lookups else 0.0
+        return (f"TTS cache: {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate), "
+                f"{self.evictions} evictions, {len(self.entries)} entries, {self.total_bytes / 1e6:.1f} MB")